@@ -1,5 +1,16 @@
-from flask import Blueprint, request, jsonify, session, current_app
-from .db import get_connection
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, session, current_app, Response
+from .db import get_connection, cached_data_version
+from .coalesce import results_flight, get_store
+from .resilience import self_limited, serve_with_fallback, limited
+from .lookups import get_lookups
+from .validation import run_check, anomaly_report
+from . import seats as seat_engine
+from .projection import projector, format_level, sum_levels
+from . import history
+from .warmup import preloaded_results
+from .profiling import span
 
 bp = Blueprint("api", __name__, url_prefix="")
 
@@ -70,6 +81,7 @@ def parties():
 
 
 @bp.get("/results")
+@self_limited
 def results():
     """
     Returns structure:
@@ -88,6 +100,9 @@ def results():
     }
     Each ballot map contains keys:
       empadronados, votos_totales, votos_recibidos, participacion, eficiencia
+
+    With ?as_of=<ISO timestamp> the results are the ones recorded at that
+    time (see app/history.py) and the payload adds "as_of" and "version".
     """
     if not _require_login():
         return jsonify({"error": "Unauthorized"}), 401
@@ -97,8 +112,25 @@ def results():
     part = (request.args.get("part_name") or "").strip()
     if not (dept and muni and part):
         return jsonify({"error": "Missing parameters"}), 400
+    as_of, error = _timestamp_arg("as_of")
+    if error:
+        return jsonify({"error": error}), 400
 
     dsn = current_app.config["DATABASE_URL"]
+    if as_of is not None:
+        # Self-limited view: history reads take their slot here
+        payload, status = limited(lambda: _results_by_name_as_of(dsn, dept, muni, part, as_of))()
+        return jsonify(payload), status
+    payload, status, headers = _serve_results(
+        ("results", dept, muni, part),
+        lambda: _results_by_name(dsn, dept, muni, part),
+    )
+    with span("jsonify"):
+        return jsonify(payload), status, headers
+
+
+def _results_by_name(dsn, dept, muni, part):
+    """Compute the /results payload; returns (payload, status)."""
     with get_connection(dsn) as conn, conn.cursor() as cur:
         # 1) mesas in the selected municipality
         cur.execute("""
@@ -108,40 +140,169 @@ def results():
         """, (dept, muni))
         mesas = [r["mesa"] for r in cur.fetchall()]
         if not mesas:
-            return jsonify({
+            return {
                 "dept_name": dept, "muni_name": muni, "part_name": part,
                 "results": {k: _zero_metrics() for k in (BALLOT_KEYS + ["TEAM"])}
-            })
+            }, 200
 
         # 2) partido_id
         cur.execute("SELECT partido_id FROM partido WHERE partido_name = %s", (part,))
         row = cur.fetchone()
         if not row:
-            return jsonify({"error": f"Partido not found: {part}"}), 404
+            return {"error": f"Partido not found: {part}"}, 404
         partido_id = row["partido_id"]
 
-        # 3) Aggregate metadata (padron, validos, emitidos) by tipo
-        cur.execute("""
-            SELECT tipo,
-                   COALESCE(SUM(padron), 0)   AS padron,
-                   COALESCE(SUM(validos), 0)  AS validos,
-                   COALESCE(SUM(emitidos), 0) AS emitidos
-            FROM metadata
-            WHERE mesa = ANY(%s)
-            GROUP BY tipo
-        """, (mesas,))
-        meta = {r["tipo"]: r for r in cur.fetchall()}
-
-        # 4) Aggregate party votes by tipo
+        # 3) Aggregate metadata and party votes by tipo
+        results = _aggregate_results(cur, mesas, partido_id)
+
+    return {
+        "dept_name": dept,
+        "muni_name": muni,
+        "part_name": part,
+        "results": results
+    }, 200
+
+
+def _results_by_name_as_of(dsn, dept, muni, part, as_of):
+    """/results?as_of=: resolve the names to ids, then read the history."""
+    payload = {"dept_name": dept, "muni_name": muni, "part_name": part}
+    _record_history(dsn)
+    with get_connection(dsn) as conn, conn.cursor() as cur:
         cur.execute("""
-            SELECT tipo, COALESCE(SUM(voto), 0) AS votos
-            FROM voto
-            WHERE mesa = ANY(%s) AND partido_id = %s
-            GROUP BY tipo
-        """, (mesas, partido_id))
-        votes = {r["tipo"]: r["votos"] for r in cur.fetchall()}
-
-    # 5) Build response per ballot
+            SELECT dept_id, muni_id
+            FROM ubis
+            WHERE dept_name = %s AND muni_name = %s
+            LIMIT 1
+        """, (dept, muni))
+        ids = cur.fetchone()
+        if not ids:
+            payload.update(as_of=as_of.isoformat(), version=None,
+                           results={k: _zero_metrics() for k in (BALLOT_KEYS + ["TEAM"])})
+            return payload, 200
+        cur.execute("SELECT partido_id FROM partido WHERE partido_name = %s", (part,))
+        row = cur.fetchone()
+        if not row:
+            return {"error": f"Partido not found: {part}"}, 404
+        payload.update(_results_as_of(cur, ids["dept_id"], ids["muni_id"], row["partido_id"], as_of))
+    return payload, 200
+
+
+def _results_by_id_as_of(dsn, dept_id, muni_id, partido_id, as_of, payload):
+    """/v2/results?as_of=: fill ``payload`` from the history; returns (payload, status)."""
+    _record_history(dsn)
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        payload.update(_results_as_of(cur, dept_id, muni_id, partido_id, as_of))
+    return payload, 200
+
+
+def _results_as_of(cur, dept_id, muni_id, partido_id, as_of):
+    """{"as_of", "version", "results"} for a municipality from the recorded history."""
+    version = history.version_at(cur, as_of)
+    if version is None:
+        results = {k: _zero_metrics() for k in (BALLOT_KEYS + ["TEAM"])}
+    else:
+        results = _ballot_results(*history.sums_at(cur, dept_id, muni_id, partido_id, version["version"]))
+    return {"as_of": as_of.isoformat(), "version": version, "results": results}
+
+
+def _record_history(dsn):
+    """Record the latest batch before reading history, if configured to."""
+    cfg = current_app.config
+    if cfg["HISTORY_RECORD_ON_READ"]:
+        history.ensure_recorded(
+            dsn,
+            cached_data_version(dsn, cfg["DATA_VERSION_TTL_SECONDS"]),
+            statement_timeout_ms=cfg["HISTORY_RECORD_TIMEOUT_MS"],
+        )
+
+
+def _timestamp_arg(name):
+    """
+    Parse an optional ISO 8601 query parameter; returns (datetime or None,
+    error). Timestamps without an offset are in the database time zone.
+    """
+    value = (request.args.get(name) or "").strip()
+    if not value:
+        return None, None
+    try:
+        return datetime.fromisoformat(value), None
+    except ValueError:
+        return None, f"Invalid {name}: {value}"
+
+
+def _serve_results(key, fn):
+    """
+    Compute a results payload through the coalescer, falling back to the
+    last good payload for ``key`` when the database is unavailable (see
+    app/resilience.py). Only the request that runs ``fn`` takes a limiter
+    slot; coalesced followers wait without one. Returns (payload, status,
+    headers).
+    """
+    return serve_with_fallback(key, lambda: _coalesced(key, limited(fn)))
+
+
+def _coalesced(key, fn):
+    """
+    Run ``fn`` once for all concurrent requests with the same ``key`` and
+    data version (see app/coalesce.py); ``fn`` returns (payload, status).
+    Payloads precomputed by the warm-up at the current version are returned
+    without running ``fn``.
+    """
+    cfg = current_app.config
+    version = cached_data_version(cfg["DATABASE_URL"], cfg["DATA_VERSION_TTL_SECONDS"])
+    payload = preloaded_results(key, version)
+    if payload is not None:
+        return payload, 200
+    if not cfg["COALESCE_ENABLED"]:
+        return fn()
+    store = None
+    if cfg["COALESCE_CROSS_WORKER"]:
+        store = get_store(cfg["COALESCE_LOCK_DIR"], cfg["COALESCE_RESULT_TTL_SECONDS"])
+    return results_flight.do(key + tuple(version), fn, store=store)
+
+
+def _aggregate_results(cur, mesas, partido_id):
+    """Per-ballot metrics (plus TEAM) for the given mesas and party."""
+    meta = _metadata_sums(cur, mesas)
+    votes = _party_votes(cur, mesas, partido_id).get(partido_id, {})
+    with span("format_metrics"):
+        return _ballot_results(meta, votes)
+
+
+def _metadata_sums(cur, mesas):
+    """{tipo: {padron, validos, emitidos}} summed over ``mesas``."""
+    cur.execute("""
+        SELECT tipo,
+               COALESCE(SUM(padron), 0)   AS padron,
+               COALESCE(SUM(validos), 0)  AS validos,
+               COALESCE(SUM(emitidos), 0) AS emitidos
+        FROM metadata
+        WHERE mesa = ANY(%s)
+        GROUP BY tipo
+    """, (mesas,))
+    return {r["tipo"]: r for r in cur.fetchall()}
+
+
+def _party_votes(cur, mesas, partido_id=None):
+    """{partido_id: {tipo: votes}} over ``mesas``, for one party or (None) all of them."""
+    where, params = "mesa = ANY(%s)", [mesas]
+    if partido_id is not None:
+        where += " AND partido_id = %s"
+        params.append(partido_id)
+    cur.execute(f"""
+        SELECT partido_id, tipo, COALESCE(SUM(voto), 0) AS votos
+        FROM voto
+        WHERE {where}
+        GROUP BY partido_id, tipo
+    """, params)
+    votes = {}
+    for r in cur.fetchall():
+        votes.setdefault(r["partido_id"], {})[r["tipo"]] = r["votos"]
+    return votes
+
+
+def _ballot_results(meta, votes):
+    """Build the per-ballot map (plus TEAM) from {tipo: sums} and {tipo: party votes}."""
     results = {}
     team_acc = {"padron": 0, "validos": 0, "emitidos": 0, "recibidos": 0}
 
@@ -160,17 +321,150 @@ def results():
         team_acc["emitidos"] += emitidos
         team_acc["recibidos"] += recibidos
 
-    # 6) TEAM = cross-ballot totals
+    # TEAM = cross-ballot totals
     results["TEAM"] = _format_metrics(
         team_acc["padron"], team_acc["validos"], team_acc["emitidos"], team_acc["recibidos"]
     )
+    return results
 
-    return jsonify({
-        "dept_name": dept,
-        "muni_name": muni,
-        "part_name": part,
-        "results": results
-    })
+
+# ---------------------------------------------------------------------------
+# ID-keyed API (/v2/*)
+#
+# Same data as the name-keyed endpoints above, but keyed on ubis.dept_id /
+# ubis.muni_id / partido.partido_id. Lists are returned as compact [id, name]
+# pairs and names are resolved from the cached lookups, so the only queries
+# left per /v2/results call are index lookups on integer/code columns.
+# ---------------------------------------------------------------------------
+
+def _lookups():
+    return get_lookups(current_app.config["DATABASE_URL"], current_app.config["LOOKUP_TTL_SECONDS"])
+
+
+@bp.get("/v2/bootstrap")
+def bootstrap():
+    """
+    Everything the dashboard needs to fill its dropdowns, in one payload:
+    {
+      "departments": [[dept_id, dept_name], ...],
+      "municipalities": {dept_id: [[muni_id, muni_name], ...], ...},
+      "parties": [[partido_id, partido_name], ...]
+    }
+    The body is serialized and gzipped once per lookup load, so serving it
+    is a dict access; clients revalidate with If-None-Match.
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    boot = _lookups()["bootstrap"]
+    headers = {
+        "ETag": f'"{boot["etag"]}"',
+        "Cache-Control": f'private, max-age={current_app.config["BOOTSTRAP_MAX_AGE_SECONDS"]}',
+        "Vary": "Accept-Encoding, Cookie",
+    }
+    if boot["etag"] in request.if_none_match:
+        return Response(status=304, headers=headers)
+    if "gzip" in request.accept_encodings:
+        headers["Content-Encoding"] = "gzip"
+        return Response(boot["gzip"], mimetype="application/json", headers=headers)
+    return Response(boot["json"], mimetype="application/json", headers=headers)
+
+
+@bp.get("/v2/departments")
+def departments_v2():
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(_lookups()["departments"])
+
+
+@bp.get("/v2/municipalities")
+def municipalities_v2():
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    dept_id = (request.args.get("dept_id") or "").strip()
+    if not dept_id:
+        return jsonify([])
+    return jsonify(_lookups()["municipalities"].get(dept_id, []))
+
+
+@bp.get("/v2/parties")
+def parties_v2():
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(_lookups()["parties"])
+
+
+@bp.get("/v2/results")
+@self_limited
+def results_v2():
+    """
+    Same structure as /results, plus the ids that were requested:
+    {
+      "dept_id": "...", "muni_id": "...", "partido_id": 1,
+      "dept_name": "...", "muni_name": "...", "part_name": "...",
+      "results": {...}
+    }
+    Accepts ?as_of= like /results.
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    dept_id = (request.args.get("dept_id") or "").strip()
+    muni_id = (request.args.get("muni_id") or "").strip()
+    partido_id = request.args.get("partido_id", type=int)
+    if not (dept_id and muni_id and partido_id is not None):
+        return jsonify({"error": "Missing parameters"}), 400
+    as_of, error = _timestamp_arg("as_of")
+    if error:
+        return jsonify({"error": error}), 400
+
+    lk = _lookups()
+    if partido_id not in lk["party_names"]:
+        return jsonify({"error": f"Partido not found: {partido_id}"}), 404
+    payload = {
+        "dept_id": dept_id,
+        "muni_id": muni_id,
+        "partido_id": partido_id,
+        "dept_name": lk["dept_names"].get(dept_id),
+        "muni_name": lk["muni_names"].get((dept_id, muni_id)),
+        "part_name": lk["party_names"][partido_id],
+    }
+
+    dsn = current_app.config["DATABASE_URL"]
+    if as_of is not None:
+        # Self-limited view: history reads take their slot here
+        payload, status = limited(lambda: _results_by_id_as_of(dsn, dept_id, muni_id, partido_id, as_of, payload))()
+        return jsonify(payload), status
+    payload, status, headers = _serve_results(
+        ("results_v2", dept_id, muni_id, partido_id),
+        lambda: _results_by_id(dsn, dept_id, muni_id, partido_id, payload),
+    )
+    with span("jsonify"):
+        return jsonify(payload), status, headers
+
+
+def _results_by_id(dsn, dept_id, muni_id, partido_id, payload):
+    """Fill ``payload`` with the /v2/results metrics; returns (payload, status)."""
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT mesa
+            FROM ubis
+            WHERE dept_id = %s AND muni_id = %s
+        """, (dept_id, muni_id))
+        mesas = [r["mesa"] for r in cur.fetchall()]
+        if not mesas:
+            payload["results"] = {k: _zero_metrics() for k in (BALLOT_KEYS + ["TEAM"])}
+            return payload, 200
+        payload["results"] = _aggregate_results(cur, mesas, partido_id)
+
+    return payload, 200
+
+
+@bp.get("/v2/coalescing")
+def coalescing_stats():
+    """Counters for this worker: executed vs. coalesced /results computations."""
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(results_flight.stats())
 
 
 def _zero_metrics():
@@ -196,3 +490,210 @@ def _format_metrics(padron: int, validos: int, emitidos: int, recibidos: int):
         "participacion": participacion,  # % turnout
         "eficiencia": eficiencia,        # % valid of emitted
     }
+
+
+@bp.get("/v2/anomalies")
+def anomalies():
+    """
+    Acta consistency report (see app/validation.py), optionally narrowed with
+    ?dept_id= and ?muni_id=. Newly loaded mesas are checked first, which is a
+    no-op when nothing was loaded since the last check; while another check
+    runs (check_actas.py or a concurrent request) the stored report is served
+    as is, with "last_check": {"mode": "busy"}.
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    dept_id = (request.args.get("dept_id") or "").strip()
+    muni_id = (request.args.get("muni_id") or "").strip()
+
+    dsn = current_app.config["DATABASE_URL"]
+    with get_connection(dsn) as conn:
+        check = run_check(conn, wait=False)
+        report = anomaly_report(conn, dept_id, muni_id)
+    report["last_check"] = check
+    return jsonify(report)
+
+
+@bp.post("/v2/seats")
+def seats():
+    """
+    D'Hondt seat allocation for every district of a ballot at once.
+    Body: {"ballot": "D_DI", "seats": {"<district>": <seats>, ...}}
+    Districts are dept_id for D_DI, "NACIONAL" for D_LN and D_PA, and
+    "<dept_id>:<muni_id>" for MUNI. While this worker is refreshing the
+    ballot's totals the previous ones are used and "in_progress" is true.
+    {
+      "ballot": "D_DI", "data_version": [metadata_id, voto_id], "recomputed_districts": 2,
+      "in_progress": false,
+      "districts": [
+        {"district": "01", "name": "...", "seats": 11, "votos": ..., "last_quotient": ...,
+         "parties": [{"partido_id": 1, "part_name": "...", "votos": ..., "seats": 3}, ...]},
+        ...
+      ]
+    }
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    body = request.get_json(silent=True) or {}
+    ballot = str(body.get("ballot") or "").strip().upper()
+    tipo = BALLOT_MAP.get(ballot)
+    if tipo not in seat_engine.DISTRICTS:
+        return jsonify({"error": f"Invalid ballot: {ballot}"}), 400
+    raw = body.get("seats")
+    if not isinstance(raw, dict) or not raw:
+        return jsonify({"error": "Missing seats per district"}), 400
+    seats_by_district = {str(k).strip(): v for k, v in raw.items()}
+    # JSON integers only: no floats, numeric strings or booleans
+    if any(type(v) is not int for v in seats_by_district.values()):
+        return jsonify({"error": "Seats must be integers"}), 400
+    if any(not 0 < v <= 200 for v in seats_by_district.values()):
+        return jsonify({"error": "Seats must be between 1 and 200"}), 400
+
+    lk = _lookups()
+    names = {d: _district_name(lk, tipo, d) for d in seats_by_district}
+    unknown = sorted(d for d, name in names.items() if name is None)
+    if unknown:
+        return jsonify({"error": f"Unknown districts for {ballot}: {', '.join(unknown)}"}), 400
+
+    version, allocations, refreshed, in_progress = seat_engine.allocate(
+        current_app.config["DATABASE_URL"], tipo, seats_by_district,
+        rebuild_after=current_app.config["SEATS_REBUILD_SECONDS"],
+    )
+
+    districts = []
+    for district, seats_n in seats_by_district.items():
+        alloc = allocations[district]
+        districts.append({
+            "district": district,
+            "name": names[district],
+            "seats": seats_n,
+            "votos": alloc["votos"],
+            "last_quotient": alloc["last_quotient"],
+            "parties": [dict(p, part_name=lk["party_names"].get(p["partido_id"])) for p in alloc["parties"]],
+        })
+
+    return jsonify({
+        "ballot": ballot,
+        "data_version": list(version),
+        "recomputed_districts": refreshed,
+        "in_progress": in_progress,
+        "districts": districts,
+    })
+
+
+def _district_name(lk, tipo, district):
+    """Display name of a seat district of ``tipo``, or None if there is no such district."""
+    if tipo == "DIPUTADOS_DISTRITAL":
+        return lk["dept_names"].get(district)
+    if tipo == "CORPORACION_MUNICIPAL":
+        dept_id, sep, muni_id = district.partition(":")
+        return lk["muni_names"].get((dept_id, muni_id)) if sep else None
+    return seat_engine.NATIONAL if district == seat_engine.NATIONAL else None
+
+
+@bp.get("/v2/projection")
+def projection():
+    """
+    Projected final figures for a ballot from the mesas counted so far
+    (see app/projection.py), nationally and per department. While this
+    worker is refreshing, the previous projection is served and "refresh"
+    carries "in_progress": true.
+      ?ballot=PRES[&dept_id=]
+    {
+      "ballot": "PRES", "refresh": {...},
+      "national": {"mesas": ..., "mesas_contadas": ..., "avance": ..., "empadronados": ...,
+                   "emitidos_proyectados": ..., "validos_proyectados": ...,
+                   "participacion": ..., "participacion_ic95": [lo, hi],
+                   "parties": [{"partido_id": 1, "part_name": "...", "votos_contados": ...,
+                                "votos_proyectados": ..., "votos_ic95": [lo, hi],
+                                "porcentaje": ..., "porcentaje_ic95": [lo, hi]}, ...]},
+      "departments": [{"dept_id": "...", "dept_name": "...", ...same keys...}, ...]
+    }
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    ballot = (request.args.get("ballot") or "").strip().upper()
+    if ballot not in BALLOT_MAP:
+        return jsonify({"error": f"Invalid ballot: {ballot}"}), 400
+    dept_id = (request.args.get("dept_id") or "").strip()
+
+    refresh = projector.refresh(current_app.config["DATABASE_URL"])
+    raws = projector.snapshot(BALLOT_MAP[ballot])
+    names = _lookups()
+    departments = [
+        dict(format_level(raw, names["party_names"]), dept_id=d, dept_name=names["dept_names"].get(d))
+        for d, raw in sorted(raws.items(), key=lambda item: names["dept_names"].get(item[0]) or "")
+        if not dept_id or d == dept_id
+    ]
+    return jsonify({
+        "ballot": ballot,
+        "refresh": refresh,
+        "national": format_level(sum_levels(raws.values()), names["party_names"]),
+        "departments": departments,
+    })
+
+
+@bp.get("/v2/history")
+def history_series():
+    """
+    How a municipality's results evolved, one point per recorded version
+    that changed it (see app/history.py):
+      ?dept_id=&muni_id=&partido_id=[&ballot=PRES][&since=][&until=]
+    {
+      "dept_id": "...", "muni_id": "...", "partido_id": 1,
+      "dept_name": "...", "muni_name": "...", "part_name": "...",
+      "points": [{"version": 12, "recorded_at": "...", "data_version": [m, v],
+                  "results": {...same map as /results, or only ?ballot=...}}, ...]
+    }
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    dept_id = (request.args.get("dept_id") or "").strip()
+    muni_id = (request.args.get("muni_id") or "").strip()
+    partido_id = request.args.get("partido_id", type=int)
+    if not (dept_id and muni_id and partido_id is not None):
+        return jsonify({"error": "Missing parameters"}), 400
+    ballot = (request.args.get("ballot") or "").strip().upper()
+    if ballot and ballot not in BALLOT_MAP and ballot != "TEAM":
+        return jsonify({"error": f"Invalid ballot: {ballot}"}), 400
+    since, error = _timestamp_arg("since")
+    if not error:
+        until, error = _timestamp_arg("until")
+    if error:
+        return jsonify({"error": error}), 400
+
+    lk = _lookups()
+    if partido_id not in lk["party_names"]:
+        return jsonify({"error": f"Partido not found: {partido_id}"}), 404
+
+    dsn = current_app.config["DATABASE_URL"]
+    _record_history(dsn)
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        rows = history.series(cur, dept_id, muni_id, partido_id, since, until)
+
+    points = []
+    for version, meta, votes in rows:
+        results = _ballot_results(meta, votes)
+        points.append(dict(version, results={ballot: results[ballot]} if ballot else results))
+    return jsonify({
+        "dept_id": dept_id,
+        "muni_id": muni_id,
+        "partido_id": partido_id,
+        "dept_name": lk["dept_names"].get(dept_id),
+        "muni_name": lk["muni_names"].get((dept_id, muni_id)),
+        "part_name": lk["party_names"][partido_id],
+        "points": points,
+    })
+
+
+@bp.get("/v2/history/versions")
+def history_versions():
+    """Recorded versions, newest first: [{"version", "recorded_at", "data_version"}, ...]."""
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    limit = min(max(request.args.get("limit", 500, type=int), 1), 5000)
+    dsn = current_app.config["DATABASE_URL"]
+    _record_history(dsn)
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        return jsonify(history.versions(cur, limit))
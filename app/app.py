@@ -6,7 +6,11 @@ import os
 
 load_dotenv()
 
-def create_app():
+def create_app(warm_up=None):
+    """
+    ``warm_up`` overrides WARMUP_ENABLED: preload connections, lookups and
+    the busiest /v2/results payloads, gating /readyz until done.
+    """
     app = Flask(__name__)
     env = os.getenv("FLASK_ENV", "production").lower()
     if env == "development":
@@ -20,11 +24,21 @@ def create_app():
     origins = app.config["CORS_ALLOW_ORIGINS"]
     CORS(app, supports_credentials=True, resources={r"/*": {"origins": origins}})
 
+    # Opt-in request profiling; first so its timing includes the limiter queue
+    from . import profiling
+    profiling.init_app(app)
+
+    # Load shedding: limiter, circuit breaker, 503 handlers
+    from . import resilience
+    resilience.init_app(app)
+
     # Blueprints
     from .auth import bp as auth_bp
     from .api import bp as api_bp
+    from .drilldown import bp as drilldown_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(drilldown_bp)
 
     @app.get("/healthz")
     def healthz():
@@ -32,42 +46,29 @@ def create_app():
 
     @app.get("/debug")
     def debug():
-        """Debug endpoint to check database connection"""
-        try:
-            from .db import get_connection
-            dsn = app.config["DATABASE_URL"]
-            if not dsn:
-                return {"error": "DATABASE_URL not set"}, 500
-            
-            with get_connection(dsn) as conn:
-                with conn.cursor() as cur:
-                    # Test auth table
-                    cur.execute("SELECT COUNT(*) as count FROM users")
-                    users_count = cur.fetchone()["count"]
-                    
-                    # Test data tables
-                    cur.execute("SELECT COUNT(*) as count FROM ubis")
-                    ubis_count = cur.fetchone()["count"]
-                    cur.execute("SELECT COUNT(*) as count FROM partido")
-                    partido_count = cur.fetchone()["count"]
-                    
-                    # Test auth query specifically
-                    cur.execute("SELECT username FROM users LIMIT 1")
-                    auth_test = cur.fetchone()
-                    
-                return {
-                    "database_url_set": bool(dsn),
-                    "connection": "success",
-                    "users_count": users_count,
-                    "ubis_count": ubis_count,
-                    "partido_count": partido_count,
-                    "auth_test": auth_test["username"] if auth_test else None
-                }
-        except Exception as e:
-            return {"error": str(e)}, 500
+        """Diagnostics from catalog statistics; cached per worker, cheap to poll"""
+        from .diagnostics import cached_run
+        from .coalesce import results_flight
+        report = cached_run(
+            app.config["DATABASE_URL"],
+            app.config["DIAGNOSTICS_CACHE_SECONDS"],
+            app.config["DIAGNOSTICS_PROBE_TIMEOUT_SECONDS"],
+        )
+        state = app.extensions["resilience"]
+        worker = {
+            "coalescing": results_flight.stats(),
+            "limiter": state["limiter"].stats(),
+            "circuit": state["breaker"].stats(),
+            "stale": state["stale"].stats(),
+        }
+        return dict(report, worker=worker), (200 if report["ok"] else 503)
 
     @app.get("/")
     def index():
         return render_template("index.html")
 
+    # Warm-up last, once every route and extension is registered
+    from . import warmup
+    warmup.init_app(app, enabled=warm_up)
+
     return app
@@ -1,7 +1,9 @@
 # auth.py
 from flask import Blueprint, request, jsonify, session, current_app
 import bcrypt
+import psycopg2
 from .db import get_connection  # adjust to ".db" only if you're using a package
+from .resilience import DatabaseUnavailable
 
 bp = Blueprint("auth", __name__, url_prefix="")
 
@@ -38,6 +40,8 @@ def login():
             session["uid"] = row["username"]
             session["uname"] = row["username"]
             return jsonify({"success": True})
+    except (DatabaseUnavailable, psycopg2.OperationalError):
+        raise  # 503 + Retry-After (app/resilience.py)
     except Exception:
         return jsonify({"success": False, "message": "Auth error"}), 500
 
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: cross-worker coalescing is unavailable
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs ``fn``; callers arriving
+    while it is in flight wait for it and get the same value or exception.
+    Nothing is cached once the leader finishes: the key should carry the
+    data version so a new load never joins a stale computation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"executed": 0, "coalesced": 0, "shared_cross_worker": 0}
+
+    def do(self, key, fn, store=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            if store is not None:
+                call.value, shared = store.run(key, fn)
+            else:
+                call.value, shared = fn(), False
+            with self._lock:
+                self._stats["shared_cross_worker" if shared else "executed"] += 1
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls), pid=os.getpid())
+
+
+class FileLockStore:
+    """
+    Cross-worker coalescing for gunicorn workers on one host.
+
+    Each key maps to a lock file in ``directory``. The worker that takes the
+    flock first computes the value and writes it next to the lock as JSON;
+    workers that were blocked on the same lock read that file instead of
+    computing again. Result files older than ``ttl`` seconds are ignored.
+    Values must be JSON-serializable (tuples come back as lists).
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, directory: str, ttl: float = 5.0):
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, key, fn):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        lock_path = os.path.join(self.directory, f"{digest}.lock")
+        result_path = os.path.join(self.directory, f"{digest}.json")
+
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                cached = self._read(result_path)
+                if cached is not None:
+                    return cached["value"], True
+                value = fn()
+                self._write(result_path, value)
+                return value, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, value):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        # Keys embed the data version, so old files are never read again
+        cutoff = time.time() - max(self.ttl * 10, 60)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+# One per worker process, shared by all request threads
+results_flight = SingleFlight()
+_stores = {}
+
+
+def get_store(directory: str, ttl: float):
+    """FileLockStore for ``directory``, or None where flock is unavailable."""
+    if fcntl is None:
+        return None
+    store = _stores.get(directory)
+    if store is None:
+        store = _stores[directory] = FileLockStore(directory, ttl)
+    return store
@@ -1,12 +1,196 @@
 
 import os
+import threading
+import time
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 from urllib.parse import urlparse
+from flask import current_app, has_app_context, has_request_context
+from . import profiling
 
-def get_connection(dsn: str):
+def get_connection(dsn: str, statement_timeout_ms=None, connect_timeout=None):
     if not dsn:
         raise RuntimeError("DATABASE_URL is not set")
+    kwargs = {}
+    if connect_timeout:
+        kwargs["connect_timeout"] = connect_timeout
+    if has_app_context():
+        # App code (requests, warm-up, background refreshes) never waits on
+        # connect longer than configured; scripts keep libpq's default.
+        kwargs.setdefault("connect_timeout", current_app.config["DB_CONNECT_TIMEOUT_SECONDS"])
+    if has_request_context():
+        # Inside a request: honour the circuit breaker and the endpoint's
+        # deadline. Scripts and CLI checks run without either.
+        from .resilience import check_circuit, statement_timeout_ms as endpoint_timeout
+        check_circuit()
+        if statement_timeout_ms is None:
+            statement_timeout_ms = endpoint_timeout()
+
+    prof = profiling.current()
+    pool_size = current_app.config.get("DB_POOL_SIZE", 0) if has_app_context() else 0
+    if pool_size:
+        pool = _get_pool(dsn, pool_size, current_app.config["DB_CONNECT_TIMEOUT_SECONDS"])
+        conn = _PooledConnection(pool, statement_timeout_ms, dsn, kwargs)
+        return conn if prof is None else prof.connection(conn)
+
+    if statement_timeout_ms:
+        kwargs["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
     # psycopg2 supports the full URL; keep sslmode=require if provided by Render
-    conn = psycopg2.connect(dsn, cursor_factory=psycopg2.extras.RealDictCursor)
-    return conn
+    with profiling.span("db.connect"):
+        conn = psycopg2.connect(dsn, cursor_factory=psycopg2.extras.RealDictCursor, **kwargs)
+    return conn if prof is None else prof.connection(conn)
+
+
+# Per-worker connection pools, keyed by (pid, dsn) so a forked worker never
+# reuses its parent's sockets.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(dsn: str, size: int, connect_timeout: int):
+    # The pool keeps the kwargs it was created with for every connection it
+    # opens later, so they come from config rather than from whichever
+    # caller (warm-up, a probe with its own timeout) happened to be first.
+    key = (os.getpid(), dsn)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = psycopg2.pool.ThreadedConnectionPool(
+                    0, size, dsn, cursor_factory=psycopg2.extras.RealDictCursor,
+                    connect_timeout=connect_timeout,
+                )
+                # putconn() only keeps a connection while fewer than minconn are
+                # idle, so minconn must be the pool size for anything to be
+                # reused; set after construction so nothing is opened up front.
+                pool.minconn = size
+                _pools[key] = pool
+    return pool
+
+
+class _PooledConnection:
+    """
+    ``with get_connection(dsn) as conn`` for pooled connections: same
+    commit/rollback on exit as a plain psycopg2 connection, then the
+    connection goes back to the pool instead of staying open until GC.
+    """
+
+    def __init__(self, pool, statement_timeout_ms, dsn, connect_kwargs):
+        self._pool = pool
+        self._dsn = dsn
+        self._connect_kwargs = connect_kwargs
+        self._conn = None
+        self._overflow = False
+        self._statement_timeout_ms = int(statement_timeout_ms or 0)
+
+    def __enter__(self):
+        # The SET doubles as a liveness check: a connection the server
+        # dropped while idle in the pool is discarded and replaced once.
+        for attempt in (1, 2):
+            try:
+                conn = self._pool.getconn()
+            except psycopg2.pool.PoolError:
+                # Pool exhausted: use a one-off connection rather than fail
+                conn = psycopg2.connect(
+                    self._dsn, cursor_factory=psycopg2.extras.RealDictCursor, **self._connect_kwargs
+                )
+                self._overflow = True
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET statement_timeout = %s", (self._statement_timeout_ms,))
+                conn.commit()
+                self._conn = conn
+                return conn
+            except psycopg2.OperationalError:
+                self._release(conn, close=True)
+                if attempt == 2:
+                    raise
+
+    def __exit__(self, exc_type, exc, tb):
+        conn, self._conn = self._conn, None
+        broken = conn.closed != 0
+        try:
+            if not broken:
+                if exc_type is None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        except psycopg2.Error:
+            broken = True
+            if exc_type is None:
+                raise
+        finally:
+            self._release(conn, close=broken)
+        return False
+
+    def _release(self, conn, close):
+        if self._overflow:
+            self._overflow = False
+            conn.close()
+        else:
+            self._pool.putconn(conn, close=close)
+
+
+def warm_pool(dsn: str, count: int):
+    """Open up to ``count`` pooled connections ahead of the first requests."""
+    if not (has_app_context() and current_app.config.get("DB_POOL_SIZE")):
+        return 0
+    held = [get_connection(dsn) for _ in range(count)]
+    opened = 0
+    try:
+        for pc in held:
+            pc.__enter__()
+            opened += 1
+    finally:
+        for pc in held[:opened]:
+            pc.__exit__(None, None, None)
+    return opened
+
+
+def data_version(cur):
+    """
+    (max metadata_id, max voto_id): bumps whenever an acta batch is loaded.
+    Both are primary keys, so this is two index probes, not a scan.
+    """
+    cur.execute("""
+        SELECT (SELECT COALESCE(MAX(metadata_id), 0) FROM metadata) AS metadata_id,
+               (SELECT COALESCE(MAX(voto_id), 0) FROM voto)         AS voto_id
+    """)
+    row = cur.fetchone()
+    return (row["metadata_id"], row["voto_id"])
+
+
+# Mesas with metadata/voto rows loaded after the data version
+# (%(metadata_id)s, %(voto_id)s), to embed as a subquery. Both ids are serial
+# primary keys, so these are index range scans over the new rows only.
+MESAS_LOADED_SINCE = """
+        SELECT mesa FROM metadata WHERE metadata_id > %(metadata_id)s
+        UNION
+        SELECT mesa FROM voto WHERE voto_id > %(voto_id)s
+"""
+
+
+def loaded_since(version):
+    """MESAS_LOADED_SINCE parameters for a data version (metadata_id, voto_id)."""
+    return {"metadata_id": version[0], "voto_id": version[1]}
+
+
+_version_lock = threading.Lock()
+_version_cache = {"at": 0.0, "value": None}
+
+
+def cached_data_version(dsn: str, ttl: float = 1.0):
+    """data_version() shared by all threads of a worker for ``ttl`` seconds."""
+    now = time.monotonic()
+    if _version_cache["value"] is not None and now - _version_cache["at"] < ttl:
+        return _version_cache["value"]
+    with _version_lock:
+        if _version_cache["value"] is not None and time.monotonic() - _version_cache["at"] < ttl:
+            return _version_cache["value"]
+        with get_connection(dsn) as conn, conn.cursor() as cur:
+            value = data_version(cur)
+        _version_cache["value"] = value
+        _version_cache["at"] = time.monotonic()
+        return value
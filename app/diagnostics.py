@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context
+
+from .db import get_connection, data_version
+
+# Cheap health/diagnostics probes. Table sizes come from catalog statistics
+# (pg_class.reltuples, pg_stat_user_tables) rather than COUNT(*), so running
+# them continuously does not scan the data tables. Every probe gets its own
+# (pooled, when run from the app) connection and a server-side
+# statement_timeout, and they run concurrently.
+
+APP_TABLES = (
+    "users", "ubis", "partido", "metadata", "voto", "acta_anomalies", "acta_check_state",
+    "mesa_metrics", "results_versions", "results_meta_delta", "results_vote_delta",
+)
+
+
+def _tables(cur):
+    cur.execute("""
+        SELECT c.relname AS table,
+               CASE WHEN c.reltuples < 0 THEN NULL ELSE c.reltuples::bigint END AS estimated_rows,
+               s.n_live_tup AS live_rows,
+               pg_total_relation_size(c.oid) AS total_bytes,
+               pg_relation_size(c.oid) AS heap_bytes,
+               pg_indexes_size(c.oid) AS index_bytes
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relname = ANY(%s)
+        ORDER BY c.relname
+    """, (list(APP_TABLES),))
+    rows = {r["table"]: dict(r) for r in cur.fetchall()}
+    missing = [t for t in APP_TABLES if t not in rows]
+    return {"tables": list(rows.values()), "missing": missing}
+
+
+def _indexes(cur):
+    cur.execute("""
+        SELECT s.relname AS table, s.indexrelname AS index,
+               s.idx_scan, s.idx_tup_read,
+               pg_relation_size(s.indexrelid) AS bytes
+        FROM pg_stat_user_indexes s
+        WHERE s.schemaname = 'public'
+        ORDER BY s.relname, s.indexrelname
+    """)
+    indexes = [dict(r) for r in cur.fetchall()]
+    cur.execute("""
+        SELECT relname AS table, seq_scan, seq_tup_read, idx_scan
+        FROM pg_stat_user_tables
+        WHERE schemaname = 'public'
+        ORDER BY relname
+    """)
+    return {"indexes": indexes, "scans": [dict(r) for r in cur.fetchall()]}
+
+
+def _bloat(cur):
+    # Dead-tuple ratio from the stats collector: an estimate, but free
+    cur.execute("""
+        SELECT relname AS table, n_live_tup, n_dead_tup,
+               CASE WHEN n_live_tup + n_dead_tup > 0
+                    THEN round(n_dead_tup::numeric * 100 / (n_live_tup + n_dead_tup), 2)
+                    ELSE 0 END AS dead_pct,
+               last_autovacuum, last_vacuum, last_autoanalyze, last_analyze
+        FROM pg_stat_user_tables
+        WHERE schemaname = 'public'
+        ORDER BY n_dead_tup DESC
+    """)
+    return {"tables": [dict(r) for r in cur.fetchall()]}
+
+
+def _cache(cur):
+    cur.execute("""
+        SELECT blks_hit, blks_read,
+               CASE WHEN blks_hit + blks_read > 0
+                    THEN round(blks_hit::numeric * 100 / (blks_hit + blks_read), 2) END AS hit_pct
+        FROM pg_stat_database
+        WHERE datname = current_database()
+    """)
+    database = dict(cur.fetchone() or {})
+    cur.execute("""
+        SELECT relname AS table, heap_blks_hit, heap_blks_read, idx_blks_hit, idx_blks_read,
+               CASE WHEN heap_blks_hit + heap_blks_read > 0
+                    THEN round(heap_blks_hit::numeric * 100 / (heap_blks_hit + heap_blks_read), 2) END AS heap_hit_pct,
+               CASE WHEN COALESCE(idx_blks_hit, 0) + COALESCE(idx_blks_read, 0) > 0
+                    THEN round(idx_blks_hit::numeric * 100 / (idx_blks_hit + idx_blks_read), 2) END AS idx_hit_pct
+        FROM pg_statio_user_tables
+        WHERE schemaname = 'public'
+        ORDER BY relname
+    """)
+    return {"database": database, "tables": [dict(r) for r in cur.fetchall()]}
+
+
+def _connections(cur):
+    cur.execute("""
+        SELECT COALESCE(state, 'unknown') AS state, COUNT(*) AS count
+        FROM pg_stat_activity
+        WHERE datname = current_database()
+        GROUP BY 1
+        ORDER BY 1
+    """)
+    by_state = {r["state"]: r["count"] for r in cur.fetchall()}
+    cur.execute("SELECT current_setting('max_connections')::int AS max_connections")
+    return {"by_state": by_state, "total": sum(by_state.values()), **cur.fetchone()}
+
+
+def _latency(cur):
+    """Time the queries the endpoints actually run, on one sample municipality."""
+    from .api import _aggregate_results
+
+    timings = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        value = fn()
+        timings[name] = round((time.perf_counter() - start) * 1000.0, 2)
+        return value
+
+    def fetch(sql, params=None):
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    timed("data_version", lambda: data_version(cur))
+    timed("users", lambda: fetch("SELECT 1 FROM users LIMIT 1"))
+    sample = timed("sample", lambda: fetch("SELECT dept_id, muni_id FROM ubis ORDER BY mesa LIMIT 1"))
+    party = fetch("SELECT partido_id FROM partido ORDER BY partido_id LIMIT 1")
+    if not sample or not party:
+        return {"timings_ms": timings, "note": "no data loaded"}
+
+    dept_id, muni_id = sample[0]["dept_id"], sample[0]["muni_id"]
+    mesas = timed("mesas", lambda: fetch(
+        "SELECT mesa FROM ubis WHERE dept_id = %s AND muni_id = %s", (dept_id, muni_id)))
+    timed("results", lambda: _aggregate_results(cur, [r["mesa"] for r in mesas], party[0]["partido_id"]))
+    return {"timings_ms": timings, "sample": {"dept_id": dept_id, "muni_id": muni_id, "mesas": len(mesas)}}
+
+
+PROBES = {
+    "tables": _tables,
+    "indexes": _indexes,
+    "bloat": _bloat,
+    "cache": _cache,
+    "connections": _connections,
+    "latency": _latency,
+}
+
+
+def _run_probe(app, dsn, probe, timeout):
+    start = time.perf_counter()
+    try:
+        # The app context gives the probe the worker's connection pool
+        with app.app_context() if app is not None else nullcontext():
+            with get_connection(dsn, statement_timeout_ms=timeout * 1000,
+                                connect_timeout=max(1, int(timeout))) as conn:
+                with conn.cursor() as cur:
+                    data = probe(cur)
+        result = {"ok": True, "data": data}
+    except Exception as e:
+        result = {"ok": False, "error": str(e).strip()}
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+    return result
+
+
+def run(dsn: str, probes=None, timeout: float = 2.0):
+    """
+    Run the named probes (all by default) concurrently; each is bounded by
+    ``timeout`` seconds both server-side and while waiting for it here.
+    """
+    names = [p for p in (probes or PROBES) if p in PROBES]
+    start = time.perf_counter()
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "database_url_set": bool(dsn),
+        "probes": {},
+    }
+    if not dsn:
+        report["ok"] = False
+        return report
+
+    app = current_app._get_current_object() if has_app_context() else None
+    pool = ThreadPoolExecutor(max_workers=len(names) or 1, thread_name_prefix="diag")
+    futures = {name: pool.submit(_run_probe, app, dsn, PROBES[name], timeout) for name in names}
+    deadline = time.monotonic() + timeout + 1.0
+    for name, future in futures.items():
+        try:
+            report["probes"][name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            report["probes"][name] = {"ok": False, "error": "timeout"}
+    # Don't wait for stragglers; their statement_timeout will end them
+    pool.shutdown(wait=False)
+
+    report["ok"] = all(p["ok"] for p in report["probes"].values())
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+    return report
+
+
+_cache_lock = threading.Lock()
+_cached = {"at": 0.0, "report": None}
+
+
+def cached_run(dsn: str, ttl: float, timeout: float):
+    """run() at most once per ``ttl`` seconds per worker; concurrent callers share it."""
+    with _cache_lock:
+        if _cached["report"] is not None and time.monotonic() - _cached["at"] < ttl:
+            return _cached["report"]
+        report = run(dsn, timeout=timeout)
+        report["pid"] = os.getpid()
+        _cached["report"] = report
+        _cached["at"] = time.monotonic()
+        return report
+
+
+def environment():
+    """Configuration checks that don't need the database (formerly debug_db.py)."""
+    return {
+        "flask_env": os.getenv("FLASK_ENV", "production"),
+        "database_url_set": bool(os.getenv("DATABASE_URL")),
+        "secret_key_set": bool(os.getenv("SECRET_KEY")),
+        "dotenv_present": os.path.exists(os.path.join(os.getcwd(), ".env")),
+    }
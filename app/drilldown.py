@@ -0,0 +1,221 @@
+import math
+
+from flask import Blueprint, request, jsonify, current_app
+from .db import get_connection
+from .api import BALLOT_MAP, _require_login, _ballot_results
+
+bp = Blueprint("drilldown", __name__, url_prefix="")
+
+# Voting-center (ubis.cdev) and per-mesa views of a municipality, keyed on
+# the same ids as /v2/results.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# sort key -> mesa_metrics column (each has a keyset index, see migrations/005)
+SORT_COLUMNS = {
+    "mesa": None,
+    "turnout": "participacion",
+    "efficiency": "eficiencia",
+}
+
+
+def _muni_args():
+    dept_id = (request.args.get("dept_id") or "").strip()
+    muni_id = (request.args.get("muni_id") or "").strip()
+    partido_id = request.args.get("partido_id", type=int)
+    return dept_id, muni_id, partido_id
+
+
+@bp.get("/v2/cdevs")
+def cdevs():
+    """
+    Per voting center (cdev) totals for a municipality and party:
+    {
+      "dept_id": "...", "muni_id": "...", "partido_id": 1,
+      "cdevs": [
+        {"cdev": "...", "mesas": 12, "results": {"MUNI": {...}, ..., "TEAM": {...}}},
+        ...
+      ]
+    }
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    dept_id, muni_id, partido_id = _muni_args()
+    if not (dept_id and muni_id and partido_id is not None):
+        return jsonify({"error": "Missing parameters"}), 400
+
+    dsn = current_app.config["DATABASE_URL"]
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT cdev, COUNT(*) AS mesas
+            FROM ubis
+            WHERE dept_id = %s AND muni_id = %s
+            GROUP BY cdev
+            ORDER BY cdev
+        """, (dept_id, muni_id))
+        centers = cur.fetchall()
+
+        cur.execute("""
+            SELECT u.cdev, m.tipo,
+                   COALESCE(SUM(m.padron), 0)   AS padron,
+                   COALESCE(SUM(m.validos), 0)  AS validos,
+                   COALESCE(SUM(m.emitidos), 0) AS emitidos
+            FROM ubis u
+            JOIN metadata m ON m.mesa = u.mesa
+            WHERE u.dept_id = %s AND u.muni_id = %s
+            GROUP BY u.cdev, m.tipo
+        """, (dept_id, muni_id))
+        meta = {}
+        for r in cur.fetchall():
+            meta.setdefault(r["cdev"], {})[r["tipo"]] = r
+
+        cur.execute("""
+            SELECT u.cdev, v.tipo, COALESCE(SUM(v.voto), 0) AS votos
+            FROM ubis u
+            JOIN voto v ON v.mesa = u.mesa
+            WHERE u.dept_id = %s AND u.muni_id = %s AND v.partido_id = %s
+            GROUP BY u.cdev, v.tipo
+        """, (dept_id, muni_id, partido_id))
+        votes = {}
+        for r in cur.fetchall():
+            votes.setdefault(r["cdev"], {})[r["tipo"]] = r["votos"]
+
+    return jsonify({
+        "dept_id": dept_id,
+        "muni_id": muni_id,
+        "partido_id": partido_id,
+        "cdevs": [
+            {
+                "cdev": c["cdev"],
+                "mesas": c["mesas"],
+                "results": _ballot_results(meta.get(c["cdev"], {}), votes.get(c["cdev"], {})),
+            }
+            for c in centers
+        ],
+    })
+
+
+@bp.get("/v2/mesas")
+def mesas():
+    """
+    One page of per-mesa metrics for a municipality, party and ballot:
+      ?dept_id=&muni_id=&partido_id=&ballot=PRES
+       [&cdev=][&sort=mesa|turnout|efficiency][&order=asc|desc][&limit=100][&after=<next_cursor>]
+    {
+      "ballot": "PRES", "sort": "turnout", "order": "desc",
+      "mesas": [{"mesa": 1, "cdev": "...", "empadronados": ..., "votos_totales": ...,
+                 "votos_emitidos": ..., "votos_recibidos": ..., "participacion": ...,
+                 "eficiencia": ...}, ...],
+      "next_cursor": "..." | null
+    }
+    Pagination is keyset on (sort value, mesa) over mesa_metrics: each page
+    seeks past the last row of the previous one in an index instead of using
+    OFFSET, so deep pages cost the same as the first. With ?cdev= the pages
+    are filtered out of that municipality index, bounded by the cdev's size.
+    """
+    if not _require_login():
+        return jsonify({"error": "Unauthorized"}), 401
+    dept_id, muni_id, partido_id = _muni_args()
+    if not (dept_id and muni_id and partido_id is not None):
+        return jsonify({"error": "Missing parameters"}), 400
+
+    ballot = (request.args.get("ballot") or "").strip().upper()
+    if ballot not in BALLOT_MAP:
+        return jsonify({"error": f"Invalid ballot: {ballot}"}), 400
+    sort = (request.args.get("sort") or "mesa").strip().lower()
+    if sort not in SORT_COLUMNS:
+        return jsonify({"error": f"Invalid sort: {sort}"}), 400
+    order = (request.args.get("order") or "asc").strip().lower()
+    if order not in ("asc", "desc"):
+        return jsonify({"error": f"Invalid order: {order}"}), 400
+    limit = max(1, min(request.args.get("limit", DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    cdev = (request.args.get("cdev") or "").strip()
+
+    try:
+        after = _parse_cursor(request.args.get("after"), sort)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    params = {
+        "dept_id": dept_id, "muni_id": muni_id, "partido_id": partido_id,
+        "tipo": BALLOT_MAP[ballot], "cdev": cdev, "limit": limit + 1,
+    }
+    cdev_filter = "AND mm.cdev = %(cdev)s" if cdev else ""
+
+    # Keys and comparison are whitelisted above; only values are parameters
+    col = SORT_COLUMNS[sort]
+    keys = f"mm.{col}, mm.mesa" if col else "mm.mesa"
+    cmp = ">" if order == "asc" else "<"
+    direction = "ASC" if order == "asc" else "DESC"
+    order_by = f"mm.{col} {direction}, mm.mesa {direction}" if col else f"mm.mesa {direction}"
+    seek = ""
+    if after is not None:
+        if col:
+            params["after_value"], params["after_mesa"] = after
+            seek = f"AND ({keys}) {cmp} (%(after_value)s, %(after_mesa)s)"
+        else:
+            params["after_mesa"] = after
+            seek = f"AND mm.mesa {cmp} %(after_mesa)s"
+
+    dsn = current_app.config["DATABASE_URL"]
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        # mesa_metrics (migrations/005) is indexed on (municipality, tipo,
+        # sort value, mesa), so the seek and ORDER BY ... LIMIT read only the
+        # page; the party's votes are looked up for those rows alone.
+        cur.execute(f"""
+            SELECT mm.mesa, mm.cdev, mm.padron, mm.validos, mm.emitidos,
+                   mm.participacion, mm.eficiencia,
+                   (SELECT COALESCE(SUM(v.voto), 0)
+                    FROM voto v
+                    WHERE v.partido_id = %(partido_id)s
+                      AND v.mesa = mm.mesa AND v.tipo = mm.tipo) AS recibidos
+            FROM mesa_metrics mm
+            WHERE mm.dept_id = %(dept_id)s AND mm.muni_id = %(muni_id)s
+              AND mm.tipo = %(tipo)s {cdev_filter} {seek}
+            ORDER BY {order_by}
+            LIMIT %(limit)s
+        """, params)
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = f"{last[col]!r},{last['mesa']}" if col else str(last["mesa"])
+
+    return jsonify({
+        "dept_id": dept_id,
+        "muni_id": muni_id,
+        "partido_id": partido_id,
+        "ballot": ballot,
+        "sort": sort,
+        "order": order,
+        "mesas": [
+            {
+                "mesa": r["mesa"],
+                "cdev": r["cdev"],
+                "empadronados": r["padron"],
+                "votos_totales": r["validos"],
+                "votos_emitidos": r["emitidos"],
+                "votos_recibidos": int(r["recibidos"]),
+                "participacion": r["participacion"],
+                "eficiencia": r["eficiencia"],
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+def _parse_cursor(raw, sort):
+    """Decode ``after``: "<mesa>" for sort=mesa, "<value>,<mesa>" otherwise."""
+    if not raw:
+        return None
+    if SORT_COLUMNS[sort] is None:
+        return int(raw)
+    value, mesa = raw.rsplit(",", 1)
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"Cursor value must be finite: {value}")
+    return value, int(mesa)
@@ -0,0 +1,281 @@
+"""
+Versioned history of the aggregated results.
+
+Every time the data version (see db.data_version) moves, record() adds a
+results_versions row and stores, per municipality and tipo, only what
+changed since the previous version: metadata sums in results_meta_delta
+and party votes in results_vote_delta. The state at any version is the
+sum of the deltas up to it, so "as of" lookups and time series read the
+small delta tables, never metadata/voto.
+
+Versions are stamped with the time record() runs, not when rows were
+loaded: record_history.py (after each load, or with --watch) is what keeps
+the stamps close to load times. Corrections made in place by UPDATE are
+only recorded by a full pass (record_history.py --full).
+"""
+import threading
+
+from .db import MESAS_LOADED_SINCE, get_connection, data_version, loaded_since
+
+# Municipalities with metadata/voto rows loaded after the previous version
+_CHANGED_SQL = f"""
+    SELECT DISTINCT u.dept_id, u.muni_id
+    FROM ubis u
+    WHERE u.dept_id IS NOT NULL AND u.muni_id IS NOT NULL
+      AND u.mesa IN ({MESAS_LOADED_SINCE})
+"""
+
+# Current sums of the changed municipalities minus what the deltas recorded
+# so far add up to; unchanged (municipality, tipo[, party]) rows are skipped
+_META_DELTA_SQL = """
+    WITH changed AS (
+        SELECT * FROM unnest(%(dept_ids)s::text[], %(muni_ids)s::text[]) AS c(dept_id, muni_id)
+    ),
+    now AS (
+        SELECT u.dept_id, u.muni_id, m.tipo,
+               COALESCE(SUM(m.padron), 0)   AS padron,
+               COALESCE(SUM(m.validos), 0)  AS validos,
+               COALESCE(SUM(m.emitidos), 0) AS emitidos
+        FROM changed c
+        JOIN ubis u ON u.dept_id = c.dept_id AND u.muni_id = c.muni_id
+        JOIN metadata m ON m.mesa = u.mesa
+        WHERE m.tipo IS NOT NULL
+        GROUP BY u.dept_id, u.muni_id, m.tipo
+    ),
+    prev AS (
+        SELECT d.dept_id, d.muni_id, d.tipo,
+               SUM(d.padron) AS padron, SUM(d.validos) AS validos, SUM(d.emitidos) AS emitidos
+        FROM changed c
+        JOIN results_meta_delta d ON d.dept_id = c.dept_id AND d.muni_id = c.muni_id
+        GROUP BY d.dept_id, d.muni_id, d.tipo
+    )
+    INSERT INTO results_meta_delta (version_id, dept_id, muni_id, tipo, padron, validos, emitidos)
+    SELECT %(version_id)s, dept_id, muni_id, tipo,
+           COALESCE(n.padron, 0) - COALESCE(p.padron, 0),
+           COALESCE(n.validos, 0) - COALESCE(p.validos, 0),
+           COALESCE(n.emitidos, 0) - COALESCE(p.emitidos, 0)
+    FROM now n
+    FULL JOIN prev p USING (dept_id, muni_id, tipo)
+    WHERE (COALESCE(n.padron, 0), COALESCE(n.validos, 0), COALESCE(n.emitidos, 0))
+          <> (COALESCE(p.padron, 0), COALESCE(p.validos, 0), COALESCE(p.emitidos, 0))
+"""
+
+_VOTE_DELTA_SQL = """
+    WITH changed AS (
+        SELECT * FROM unnest(%(dept_ids)s::text[], %(muni_ids)s::text[]) AS c(dept_id, muni_id)
+    ),
+    now AS (
+        SELECT u.dept_id, u.muni_id, v.tipo, v.partido_id, COALESCE(SUM(v.voto), 0) AS votos
+        FROM changed c
+        JOIN ubis u ON u.dept_id = c.dept_id AND u.muni_id = c.muni_id
+        JOIN voto v ON v.mesa = u.mesa
+        WHERE v.tipo IS NOT NULL AND v.partido_id IS NOT NULL
+        GROUP BY u.dept_id, u.muni_id, v.tipo, v.partido_id
+    ),
+    prev AS (
+        SELECT d.dept_id, d.muni_id, d.tipo, d.partido_id, SUM(d.votos) AS votos
+        FROM changed c
+        JOIN results_vote_delta d ON d.dept_id = c.dept_id AND d.muni_id = c.muni_id
+        GROUP BY d.dept_id, d.muni_id, d.tipo, d.partido_id
+    )
+    INSERT INTO results_vote_delta (version_id, dept_id, muni_id, tipo, partido_id, votos)
+    SELECT %(version_id)s, dept_id, muni_id, tipo, partido_id,
+           COALESCE(n.votos, 0) - COALESCE(p.votos, 0)
+    FROM now n
+    FULL JOIN prev p USING (dept_id, muni_id, tipo, partido_id)
+    WHERE COALESCE(n.votos, 0) <> COALESCE(p.votos, 0)
+"""
+
+
+def record(conn, full: bool = False):
+    """
+    Record the current data version if it is new. Returns a summary dict
+    with the version row and how many delta rows it added.
+
+    Rows corrected in place by UPDATE don't move the data version; with
+    ``full`` every municipality is compared with the recorded sums and any
+    difference is recorded as a new version (nothing if there is none).
+    """
+    with conn.cursor() as cur:
+        # Serialize recorders; a second caller waits, then finds nothing new
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('results_versions'))")
+        cur.execute("""
+            SELECT version_id, metadata_id, voto_id, recorded_at
+            FROM results_versions
+            ORDER BY version_id DESC
+            LIMIT 1
+        """)
+        last = cur.fetchone()
+        version = data_version(cur)
+        unchanged = last is not None and (last["metadata_id"], last["voto_id"]) == version
+        if unchanged and not full:
+            conn.commit()
+            return dict(_version_info(last), recorded=False, municipalities=0, meta_rows=0, vote_rows=0)
+
+        if full:
+            cur.execute("""
+                SELECT DISTINCT dept_id, muni_id
+                FROM ubis
+                WHERE dept_id IS NOT NULL AND muni_id IS NOT NULL
+            """)
+        else:
+            cur.execute(_CHANGED_SQL, loaded_since((last["metadata_id"], last["voto_id"]) if last else (0, 0)))
+        changed = cur.fetchall()
+
+        cur.execute("""
+            INSERT INTO results_versions (metadata_id, voto_id)
+            VALUES (%s, %s)
+            RETURNING version_id, metadata_id, voto_id, recorded_at
+        """, version)
+        row = cur.fetchone()
+        meta_rows = vote_rows = 0
+        if changed:
+            params = {
+                "version_id": row["version_id"],
+                "dept_ids": [c["dept_id"] for c in changed],
+                "muni_ids": [c["muni_id"] for c in changed],
+            }
+            cur.execute(_META_DELTA_SQL, params)
+            meta_rows = cur.rowcount
+            cur.execute(_VOTE_DELTA_SQL, params)
+            vote_rows = cur.rowcount
+        if unchanged and not (meta_rows or vote_rows):
+            # A full pass that found no corrections: keep the last version
+            conn.rollback()
+            return dict(_version_info(last), recorded=False, municipalities=len(changed),
+                        meta_rows=0, vote_rows=0)
+    conn.commit()
+    return dict(_version_info(row), recorded=True, municipalities=len(changed),
+                meta_rows=meta_rows, vote_rows=vote_rows)
+
+
+_recorded_lock = threading.Lock()
+_recorded = {"data_version": None}
+
+
+def ensure_recorded(dsn: str, current_version, statement_timeout_ms=None):
+    """
+    record() unless this worker already recorded ``current_version``
+    (normally db.cached_data_version), so history reads include the
+    latest batch without a write per request.
+    """
+    if _recorded["data_version"] == tuple(current_version):
+        return
+    with _recorded_lock:
+        if _recorded["data_version"] == tuple(current_version):
+            return
+        with get_connection(dsn, statement_timeout_ms=statement_timeout_ms) as conn:
+            info = record(conn)
+        _recorded["data_version"] = tuple(info["data_version"])
+
+
+def version_at(cur, as_of):
+    """The last version recorded at or before ``as_of`` (a datetime), or None."""
+    cur.execute("""
+        SELECT version_id, metadata_id, voto_id, recorded_at
+        FROM results_versions
+        WHERE recorded_at <= %s
+        ORDER BY recorded_at DESC, version_id DESC
+        LIMIT 1
+    """, (as_of,))
+    row = cur.fetchone()
+    return _version_info(row) if row else None
+
+
+def sums_at(cur, dept_id: str, muni_id: str, partido_id: int, version_id: int):
+    """
+    ({tipo: {padron, validos, emitidos}}, {tipo: party votes}) for a
+    municipality as of ``version_id``, in the shape api._ballot_results takes.
+    """
+    cur.execute("""
+        SELECT tipo,
+               SUM(padron)   AS padron,
+               SUM(validos)  AS validos,
+               SUM(emitidos) AS emitidos
+        FROM results_meta_delta
+        WHERE dept_id = %s AND muni_id = %s AND version_id <= %s
+        GROUP BY tipo
+    """, (dept_id, muni_id, version_id))
+    meta = {r["tipo"]: r for r in cur.fetchall()}
+    cur.execute("""
+        SELECT tipo, SUM(votos) AS votos
+        FROM results_vote_delta
+        WHERE dept_id = %s AND muni_id = %s AND partido_id = %s AND version_id <= %s
+        GROUP BY tipo
+    """, (dept_id, muni_id, partido_id, version_id))
+    votes = {r["tipo"]: r["votos"] for r in cur.fetchall()}
+    return meta, votes
+
+
+def series(cur, dept_id: str, muni_id: str, partido_id: int, since=None, until=None):
+    """
+    Cumulative sums of a municipality after every version that changed it:
+    [(version info, {tipo: metadata sums}, {tipo: party votes}), ...].
+    Deltas before ``since`` are folded into the first point.
+    """
+    cur.execute("""
+        SELECT d.version_id, d.tipo, d.padron, d.validos, d.emitidos, NULL::bigint AS votos
+        FROM results_meta_delta d
+        JOIN results_versions v ON v.version_id = d.version_id
+        WHERE d.dept_id = %(dept_id)s AND d.muni_id = %(muni_id)s
+          AND (%(until)s::timestamptz IS NULL OR v.recorded_at <= %(until)s)
+        UNION ALL
+        SELECT d.version_id, d.tipo, NULL, NULL, NULL, d.votos
+        FROM results_vote_delta d
+        JOIN results_versions v ON v.version_id = d.version_id
+        WHERE d.dept_id = %(dept_id)s AND d.muni_id = %(muni_id)s AND d.partido_id = %(partido_id)s
+          AND (%(until)s::timestamptz IS NULL OR v.recorded_at <= %(until)s)
+        ORDER BY 1
+    """, {"dept_id": dept_id, "muni_id": muni_id, "partido_id": partido_id, "until": until})
+    rows = cur.fetchall()
+    if not rows:
+        return []
+    cur.execute("""
+        SELECT version_id, metadata_id, voto_id, recorded_at,
+               (%s::timestamptz IS NULL OR recorded_at >= %s) AS in_range
+        FROM results_versions
+        WHERE version_id = ANY(%s)
+    """, (since, since, sorted({r["version_id"] for r in rows})))
+    versions = {r["version_id"]: r for r in cur.fetchall()}
+
+    points = []
+    meta, votes = {}, {}
+    for i, r in enumerate(rows):
+        if r["votos"] is None:
+            m = meta.setdefault(r["tipo"], {"padron": 0, "validos": 0, "emitidos": 0})
+            m["padron"] += r["padron"]
+            m["validos"] += r["validos"]
+            m["emitidos"] += r["emitidos"]
+        else:
+            votes[r["tipo"]] = votes.get(r["tipo"], 0) + r["votos"]
+        # Emit once per version, after its last delta row
+        if i + 1 < len(rows) and rows[i + 1]["version_id"] == r["version_id"]:
+            continue
+        info = versions[r["version_id"]]
+        if not info["in_range"]:
+            continue
+        points.append((
+            _version_info(info),
+            {t: dict(m) for t, m in meta.items()},
+            dict(votes),
+        ))
+    return points
+
+
+def versions(cur, limit: int = 500):
+    """Most recent versions first: [{version, recorded_at, data_version}, ...]."""
+    cur.execute("""
+        SELECT version_id, metadata_id, voto_id, recorded_at
+        FROM results_versions
+        ORDER BY version_id DESC
+        LIMIT %s
+    """, (limit,))
+    return [_version_info(r) for r in cur.fetchall()]
+
+
+def _version_info(row):
+    return {
+        "version": row["version_id"],
+        "recorded_at": row["recorded_at"].isoformat() if row["recorded_at"] else None,
+        "data_version": [row["metadata_id"], row["voto_id"]],
+    }
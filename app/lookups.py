@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from .db import get_connection
+
+# Process-wide cache of the id <-> name mappings for ubis and partido.
+# These tables only change when a new electoral geography is loaded, so a
+# short TTL is enough to pick up reloads without hitting the DB per request.
+_lock = threading.Lock()
+_cache = {"loaded_at": 0.0, "data": None}
+
+
+def _load(dsn: str):
+    with get_connection(dsn) as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT dept_id, dept_name, muni_id, muni_name
+            FROM ubis
+            WHERE dept_id IS NOT NULL AND muni_id IS NOT NULL
+            ORDER BY dept_name, muni_name
+        """)
+        geo_rows = cur.fetchall()
+        cur.execute("""
+            SELECT partido_id, partido_name
+            FROM partido
+            WHERE partido_name IS NOT NULL AND partido_name <> ''
+            ORDER BY partido_name
+        """)
+        party_rows = cur.fetchall()
+
+    dept_names = {}
+    muni_names = {}
+    munis_by_dept = {}
+    for r in geo_rows:
+        dept_names.setdefault(r["dept_id"], r["dept_name"])
+        muni_names[(r["dept_id"], r["muni_id"])] = r["muni_name"]
+        munis_by_dept.setdefault(r["dept_id"], []).append([r["muni_id"], r["muni_name"]])
+
+    data = {
+        # Compact [id, name] pairs, already sorted by name for the dropdowns
+        "departments": sorted(([k, v] for k, v in dept_names.items()), key=lambda p: p[1] or ""),
+        "municipalities": munis_by_dept,
+        "parties": [[r["partido_id"], r["partido_name"]] for r in party_rows],
+        # Reverse maps used to resolve ids in responses
+        "dept_names": dept_names,
+        "muni_names": muni_names,
+        "party_names": {r["partido_id"]: r["partido_name"] for r in party_rows},
+    }
+    data["bootstrap"] = _build_bootstrap(data)
+    return data
+
+
+def _build_bootstrap(data):
+    """Serialize the dropdown data once per load: raw JSON, gzipped copy and ETag."""
+    body = json.dumps({
+        "departments": data["departments"],
+        "municipalities": data["municipalities"],
+        "parties": data["parties"],
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "json": body,
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "etag": hashlib.sha1(body).hexdigest(),
+    }
+
+
+def get_lookups(dsn: str, ttl: int = 300, force: bool = False):
+    """Return the cached geography/party lookups, reloading after ``ttl`` seconds."""
+    now = time.monotonic()
+    data = _cache["data"]
+    if not force and data is not None and now - _cache["loaded_at"] < ttl:
+        return data
+    with _lock:
+        # Another thread may have refreshed while we waited for the lock
+        if not force and _cache["data"] is not None and time.monotonic() - _cache["loaded_at"] < ttl:
+            return _cache["data"]
+        data = _load(dsn)
+        _cache["data"] = data
+        _cache["loaded_at"] = time.monotonic()
+        return data
+
+
+def invalidate():
+    with _lock:
+        _cache["data"] = None
+        _cache["loaded_at"] = 0.0
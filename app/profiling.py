@@ -0,0 +1,332 @@
+"""
+Opt-in profiling of single requests.
+
+A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>`` or
+is picked by PROFILING_SAMPLE_RATE (sampled endpoints only). It gets a
+span breakdown (connection checkout, each query and its row fetch, the
+metrics loop, jsonify) and, with ``X-Profile-Flamegraph: 1``, a stack
+sampler running alongside it. The response carries ``X-Trace-Id``; the
+profile is written to PROFILING_DIR and served by /debug/profiles/<id>.
+
+Nothing is hooked into the app unless a token or a sample rate is set;
+instrumented code only pays a ContextVar lookup per span.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from flask import Response, abort, g, jsonify, request, session
+
+_current = ContextVar("profile", default=None)
+_NOOP = nullcontext()
+_TRACE_ID = re.compile(r"[0-9a-f]{16}")
+
+
+def current():
+    """The profile of the running request, or None."""
+    return _current.get()
+
+
+def span(name: str):
+    """``with span("name"):`` times the block when the request is profiled."""
+    prof = _current.get()
+    return _NOOP if prof is None else prof.span(name)
+
+
+class Profile:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.spans = []
+        self.queries = 0
+        self._t0 = time.perf_counter()
+        self._depth = 0
+        self._sampler = None
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        entry = dict(name=name, depth=self._depth, start_ms=self._ms(), **attrs)
+        self.spans.append(entry)
+        self._depth += 1
+        try:
+            yield entry
+        finally:
+            self._depth -= 1
+            entry["duration_ms"] = round(self._ms() - entry["start_ms"], 3)
+
+    def connection(self, conn):
+        """Wrap what db.get_connection returns so checkout and queries are timed."""
+        return _ProfiledConnection(conn, self)
+
+    def start_sampler(self, interval_ms: float):
+        self._sampler = _StackSampler(threading.get_ident(), interval_ms / 1000.0)
+        self._sampler.start()
+
+    def stop_sampler(self):
+        """Stop the stack sampler, if any; returns its folded stacks or None."""
+        sampler, self._sampler = self._sampler, None
+        return sampler.stop() if sampler else None
+
+    def finish(self, status: int):
+        stacks = self.stop_sampler()
+        return {
+            "trace_id": self.trace_id,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": status,
+            "started_at": self.started_at,
+            "total_ms": round(self._ms(), 3),
+            "queries": self.queries,
+            "spans": self.spans,
+        }, stacks
+
+    def _ms(self):
+        return (time.perf_counter() - self._t0) * 1000.0
+
+
+class _ProfiledConnection:
+    """
+    Stands in for ``get_connection()``'s result: entering it is the pool
+    checkout (plus the statement_timeout SET), cursors time every execute
+    and fetch separately so row building shows up on its own.
+    """
+
+    def __init__(self, inner, prof):
+        self._inner = inner
+        self._prof = prof
+
+    def __enter__(self):
+        with self._prof.span("db.checkout"):
+            conn = self._inner.__enter__()
+        return _ProfiledConnection(conn, self._prof)
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._prof.span("db.commit"):
+            return self._inner.__exit__(exc_type, exc, tb)
+
+    def cursor(self, *args, **kwargs):
+        return _ProfiledCursor(self._inner.cursor(*args, **kwargs), self._prof)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _ProfiledCursor:
+    def __init__(self, inner, prof):
+        self._inner = inner
+        self._prof = prof
+        self._label = None
+
+    def __enter__(self):
+        self._inner.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._inner.__exit__(exc_type, exc, tb)
+
+    def execute(self, sql, params=None):
+        self._prof.queries += 1
+        self._label = f"{self._prof.queries}: {_summarize(sql)}"
+        with self._prof.span(f"sql {self._label}"):
+            return self._inner.execute(sql, params)
+
+    def fetchone(self):
+        with self._prof.span(f"rows {self._label}"):
+            return self._inner.fetchone()
+
+    def fetchall(self):
+        with self._prof.span(f"rows {self._label}") as entry:
+            rows = self._inner.fetchall()
+            entry["rows"] = len(rows)
+            return rows
+
+    def fetchmany(self, size=None):
+        with self._prof.span(f"rows {self._label}") as entry:
+            rows = self._inner.fetchmany(size) if size is not None else self._inner.fetchmany()
+            entry["rows"] = len(rows)
+            return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def _summarize(sql, limit: int = 80):
+    """First ``limit`` characters of a statement, whitespace collapsed; never the parameters."""
+    text = " ".join(str(sql).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the request thread's stack every ``interval`` seconds and
+    counts identical stacks, in the folded format flamegraph.pl and
+    speedscope read ("outer;inner count" per line).
+    """
+
+    MAX_SAMPLES = 20000
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name=f"profile-sampler-{thread_id}", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._done = threading.Event()
+        self._counts = {}
+
+    def run(self):
+        samples = 0
+        while not self._done.wait(self._interval) and samples < self.MAX_SAMPLES:
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self._counts[key] = self._counts.get(key, 0) + 1
+                samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return "".join(f"{stack} {n}\n" for stack, n in
+                       sorted(self._counts.items(), key=lambda item: -item[1]))
+
+
+class ProfileStore:
+    """Profiles as files in ``directory``, keeping the newest ``max_profiles``."""
+
+    def __init__(self, directory: str, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, profile, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile["trace_id"])
+        profile["flamegraph"] = stacks is not None
+        if stacks is not None:
+            with open(base + ".folded", "w") as f:
+                f.write(stacks)
+        tmp = f"{base}.json.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp, base + ".json")
+        self._prune()
+
+    def load(self, trace_id: str, suffix: str = ".json"):
+        try:
+            with open(os.path.join(self.directory, trace_id + suffix)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def recent(self, limit: int = 50):
+        out = []
+        for name in self._names()[:limit]:
+            raw = self.load(name[:-len(".json")])
+            if raw is None:
+                continue
+            p = json.loads(raw)
+            out.append({k: p.get(k) for k in ("trace_id", "method", "path", "status",
+                                              "started_at", "total_ms", "queries", "flamegraph")})
+        return out
+
+    def _names(self):
+        """Saved profile files, newest first."""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        return [e.name for e in entries]
+
+    def _prune(self):
+        with self._lock:
+            for name in self._names()[self.max_profiles:]:
+                for suffix in (".json", ".folded"):
+                    try:
+                        os.remove(os.path.join(self.directory, name[:-len(".json")] + suffix))
+                    except FileNotFoundError:
+                        pass
+
+
+def init_app(app):
+    cfg = app.config
+    token = cfg["PROFILING_TOKEN"]
+    rate = cfg["PROFILING_SAMPLE_RATE"]
+    if not token and rate <= 0:
+        return None
+    store = app.extensions["profiling"] = ProfileStore(cfg["PROFILING_DIR"], cfg["PROFILING_MAX_PROFILES"])
+    sampled = set(cfg["PROFILING_SAMPLED_ENDPOINTS"])
+
+    def _authorized():
+        supplied = request.headers.get("X-Profile", "")
+        return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+    @app.before_request
+    def _start_profile():
+        requested = "X-Profile" in request.headers and _authorized()
+        if not requested and not (request.endpoint in sampled and random.random() < rate):
+            return None
+        prof = Profile(secrets.token_hex(8))
+        g.profile_reset = _current.set(prof)
+        flamegraph = request.headers.get("X-Profile-Flamegraph") == "1" if requested \
+            else cfg["PROFILING_FLAMEGRAPH_SAMPLED"]
+        if flamegraph:
+            prof.start_sampler(cfg["PROFILING_SAMPLER_INTERVAL_MS"])
+        return None
+
+    @app.after_request
+    def _finish_profile(response):
+        prof = _current.get()
+        if prof is not None and "profile_reset" in g:
+            profile, stacks = prof.finish(response.status_code)
+            store.save(profile, stacks)
+            response.headers["X-Trace-Id"] = prof.trace_id
+        return response
+
+    @app.teardown_request
+    def _clear_profile(exc):
+        reset = g.pop("profile_reset", None)
+        if reset is not None:
+            prof = _current.get()
+            if prof is not None:
+                prof.stop_sampler()
+            _current.reset(reset)
+
+    def _require_access():
+        if not (session.get("uid") or _authorized()):
+            abort(Response('{"error": "Unauthorized"}', status=401, mimetype="application/json"))
+
+    @app.get("/debug/profiles")
+    def profiles():
+        """Newest stored profiles of this instance (summaries)."""
+        _require_access()
+        return jsonify(store.recent(request.args.get("limit", 50, type=int)))
+
+    @app.get("/debug/profiles/<trace_id>")
+    def profile(trace_id):
+        """A stored profile; ?format=folded returns its stack samples."""
+        _require_access()
+        if not _TRACE_ID.fullmatch(trace_id):
+            return jsonify({"error": "Invalid trace id"}), 400
+        folded = request.args.get("format") == "folded"
+        raw = store.load(trace_id, ".folded" if folded else ".json")
+        if raw is None:
+            return jsonify({"error": f"Profile not found: {trace_id}"}), 404
+        return Response(raw, mimetype="text/plain" if folded else "application/json")
+
+    return store
@@ -0,0 +1,430 @@
+import math
+import threading
+import time
+
+from .db import MESAS_LOADED_SINCE, get_connection, data_version, loaded_since
+
+# Partial-count projection.
+#
+# Strata are voting centers (dept_id, muni_id, cdev). A mesa is counted once
+# its metadata row for the ballot has emitidos. Within each stratum the
+# uncounted padron is projected with a ratio estimator on padron:
+#
+#   Y_hat = y_counted + R * (X_stratum - x_counted),   R = sum(y) / sum(x)
+#
+# where X_stratum is the stratum's padron (known per mesa from metadata,
+# the stratum/municipality/department mean padron per mesa for the rest).
+# Strata with no counted mesas borrow R from their municipality, then
+# their department. The variance of the uncounted part is
+#
+#   V = (N - n) * (1 + (N - n) / n_src) * s_e^2,   e_i = y_i - R x_i
+#
+# (the usual finite-population ratio estimator variance when the source is
+# the stratum itself), and 95% intervals are Y_hat +/- 1.96 sqrt(V).
+#
+# Only sufficient statistics (n, sums, sums of squares and cross products)
+# are kept per (ballot, stratum, party), aggregated by Postgres. When a batch
+# is loaded only the strata it touched are re-aggregated, and only their
+# departments are re-projected; the national figures are the sum of the
+# department ones.
+
+Z95 = 1.96
+
+_STRATUM = "u.dept_id, u.muni_id, COALESCE(u.cdev, '')"
+_FILTER = f"""
+    AND ({_STRATUM}) IN (
+        SELECT * FROM unnest(%(depts)s::text[], %(munis)s::text[], %(cdevs)s::text[])
+    )
+"""
+
+
+def _filter_params(strata):
+    strata = list(strata)
+    return {
+        "depts": [s[0] for s in strata],
+        "munis": [s[1] for s in strata],
+        "cdevs": [s[2] for s in strata],
+    }
+
+
+class _Var:
+    """Sums for one variable y over counted mesas: sum(y), sum(y^2), sum(x*y)."""
+    __slots__ = ("s", "ss", "sx")
+
+    def __init__(self, s=0.0, ss=0.0, sx=0.0):
+        self.s, self.ss, self.sx = s, ss, sx
+
+    def add(self, other):
+        self.s += other.s
+        self.ss += other.ss
+        self.sx += other.sx
+
+
+_ZERO = _Var()
+
+
+class _Meta:
+    """Counted-mesa sums for a ballot in a stratum (x = padron)."""
+    __slots__ = ("n", "x", "xx", "emitidos", "validos")
+
+    def __init__(self):
+        self.n = 0
+        self.x = 0.0
+        self.xx = 0.0
+        self.emitidos = _Var()
+        self.validos = _Var()
+
+    def add(self, other):
+        self.n += other.n
+        self.x += other.x
+        self.xx += other.xx
+        self.emitidos.add(other.emitidos)
+        self.validos.add(other.validos)
+
+
+class _Stats:
+    """
+    Sufficient statistics and department projections at one data version.
+    A published instance is never modified: refreshes work on a copy().
+    """
+
+    def __init__(self):
+        self.strata = {}         # stratum -> {"mesas", "known", "padron"}
+        self.meta = {}           # (tipo, stratum) -> _Meta
+        self.party = {}          # (tipo, stratum) -> {partido_id: _Var}
+        self.dept_results = {}   # dept_id -> {tipo: raw department totals}
+        self.tipos = set()
+
+    def copy(self):
+        # Shallow: load() replaces per-stratum entries instead of mutating them
+        new = _Stats()
+        new.strata = dict(self.strata)
+        new.meta = dict(self.meta)
+        new.party = dict(self.party)
+        new.dept_results = dict(self.dept_results)
+        new.tipos = set(self.tipos)
+        return new
+
+    # -- loading ---------------------------------------------------------
+
+    def load(self, cur, strata):
+        """(Re)aggregate the given strata (all when None); returns affected departments."""
+        if strata is None:
+            where, params = "", {}
+            self.strata.clear()
+            self.meta.clear()
+            self.party.clear()
+            self.dept_results.clear()
+        else:
+            if not strata:
+                return set()
+            where, params = _FILTER, _filter_params(strata)
+            for s in strata:
+                self.strata.pop(s, None)
+            for key in [k for k in self.meta if k[1] in strata]:
+                del self.meta[key]
+            for key in [k for k in self.party if k[1] in strata]:
+                del self.party[key]
+
+        # Mesas and padron per stratum; padron is per mesa, whatever the ballot
+        cur.execute(f"""
+            SELECT u.dept_id, u.muni_id, COALESCE(u.cdev, '') AS cdev,
+                   COUNT(*) AS mesas, COUNT(p.padron) AS known, COALESCE(SUM(p.padron), 0) AS padron
+            FROM ubis u
+            LEFT JOIN LATERAL (
+                SELECT MAX(m.padron) AS padron FROM metadata m WHERE m.mesa = u.mesa
+            ) p ON true
+            WHERE u.dept_id IS NOT NULL AND u.muni_id IS NOT NULL {where}
+            GROUP BY 1, 2, 3
+        """, params)
+        for r in cur.fetchall():
+            self.strata[(r["dept_id"], r["muni_id"], r["cdev"])] = {
+                "mesas": r["mesas"], "known": r["known"], "padron": float(r["padron"]),
+            }
+
+        # Counted mesas per ballot
+        cur.execute(f"""
+            SELECT u.dept_id, u.muni_id, COALESCE(u.cdev, '') AS cdev, m.tipo,
+                   COUNT(*) AS n,
+                   SUM(m.padron)::float8 AS x,
+                   SUM(m.padron::float8 * m.padron) AS xx,
+                   SUM(m.emitidos)::float8 AS e,
+                   SUM(m.emitidos::float8 * m.emitidos) AS ee,
+                   SUM(m.padron::float8 * m.emitidos) AS xe,
+                   SUM(COALESCE(m.validos, 0))::float8 AS v,
+                   SUM(COALESCE(m.validos, 0)::float8 * COALESCE(m.validos, 0)) AS vv,
+                   SUM(m.padron::float8 * COALESCE(m.validos, 0)) AS xv
+            FROM metadata m
+            JOIN ubis u ON u.mesa = m.mesa
+            WHERE m.emitidos IS NOT NULL AND m.padron IS NOT NULL
+              AND u.dept_id IS NOT NULL AND u.muni_id IS NOT NULL {where}
+            GROUP BY 1, 2, 3, 4
+        """, params)
+        for r in cur.fetchall():
+            meta = _Meta()
+            meta.n, meta.x, meta.xx = r["n"], r["x"], r["xx"]
+            meta.emitidos = _Var(r["e"], r["ee"], r["xe"])
+            meta.validos = _Var(r["v"], r["vv"], r["xv"])
+            self.meta[(r["tipo"], (r["dept_id"], r["muni_id"], r["cdev"]))] = meta
+            self.tipos.add(r["tipo"])
+
+        # Party votes in counted mesas; a missing voto row counts as 0
+        cur.execute(f"""
+            SELECT u.dept_id, u.muni_id, COALESCE(u.cdev, '') AS cdev, v.tipo, v.partido_id,
+                   SUM(v.voto)::float8 AS y,
+                   SUM(v.voto::float8 * v.voto) AS yy,
+                   SUM(m.padron::float8 * v.voto) AS xy
+            FROM voto v
+            JOIN metadata m ON m.mesa = v.mesa AND m.tipo = v.tipo
+            JOIN ubis u ON u.mesa = v.mesa
+            WHERE m.emitidos IS NOT NULL AND m.padron IS NOT NULL
+              AND u.dept_id IS NOT NULL AND u.muni_id IS NOT NULL {where}
+            GROUP BY 1, 2, 3, 4, 5
+        """, params)
+        for r in cur.fetchall():
+            key = (r["tipo"], (r["dept_id"], r["muni_id"], r["cdev"]))
+            self.party.setdefault(key, {})[r["partido_id"]] = _Var(r["y"], r["yy"], r["xy"])
+
+        if strata is None:
+            return {s[0] for s in self.strata}
+        return {s[0] for s in strata}
+
+    # -- estimation ------------------------------------------------------
+
+    def project(self, depts):
+        by_dept = {}
+        for s in self.strata:
+            if s[0] in depts:
+                by_dept.setdefault(s[0], []).append(s)
+        for dept in depts:
+            strata = by_dept.get(dept)
+            if not strata:
+                self.dept_results.pop(dept, None)
+                continue
+            self.dept_results[dept] = {tipo: self._project_dept(tipo, strata) for tipo in self.tipos}
+
+    def _project_dept(self, tipo, strata):
+        # Municipality and department pools used when a stratum lacks data
+        muni_meta, muni_party, muni_pad = {}, {}, {}
+        dept_meta, dept_party, dept_pad = _Meta(), {}, [0, 0.0]
+        for s in strata:
+            info = self.strata[s]
+            pad = muni_pad.setdefault(s[1], [0, 0.0])
+            pad[0] += info["known"]
+            pad[1] += info["padron"]
+            dept_pad[0] += info["known"]
+            dept_pad[1] += info["padron"]
+            meta = self.meta.get((tipo, s))
+            if meta is not None:
+                muni_meta.setdefault(s[1], _Meta()).add(meta)
+                dept_meta.add(meta)
+            for pid, var in self.party.get((tipo, s), {}).items():
+                muni_party.setdefault(s[1], {}).setdefault(pid, _Var()).add(var)
+                dept_party.setdefault(pid, _Var()).add(var)
+
+        out = {
+            "mesas": 0, "contadas": 0, "padron": 0.0,
+            "emitidos": [0.0, 0.0, 0.0], "validos": [0.0, 0.0, 0.0], "parties": {},
+        }
+        empty = _Meta()
+        pids = set(dept_party)
+        for s in strata:
+            info = self.strata[s]
+            meta = self.meta.get((tipo, s), empty)
+            mmeta = muni_meta.get(s[1], empty)
+            # Padron of the stratum: known mesas plus the best available mean for the rest
+            mean = next((p[1] / p[0] for p in (
+                (info["known"], info["padron"]), muni_pad[s[1]], dept_pad) if p[0] > 0), 0.0)
+            X = info["padron"] + (info["mesas"] - info["known"]) * mean
+            N, n = info["mesas"], meta.n
+            out["mesas"] += N
+            out["contadas"] += n
+            out["padron"] += X
+
+            # Rate source: stratum, municipality, department (needs counted padron);
+            # variance source: same chain, but needs at least two counted mesas
+            parties = self.party.get((tipo, s), {})
+            chain = ((meta, parties), (mmeta, muni_party.get(s[1], {})), (dept_meta, dept_party))
+            rate_meta, rate_parties = next((c for c in chain if c[0].n > 0 and c[0].x > 0), (None, None))
+            var_meta, var_parties = next((c for c in chain if c[0].n > 1 and c[0].x > 0), (None, None))
+
+            # Per-stratum factors shared by every variable
+            remaining_n = N - n
+            if rate_meta is None:
+                terms = None
+            else:
+                k = math.nan if var_meta is None else (
+                    remaining_n * (1 + remaining_n / var_meta.n) / (var_meta.n - 1))
+                terms = (max(0.0, X - meta.x) / rate_meta.x, remaining_n > 0, k,
+                         var_meta.x if var_meta else 0.0, var_meta.xx if var_meta else 0.0)
+
+            _accumulate(out["emitidos"], meta.emitidos, rate_meta and rate_meta.emitidos,
+                        var_meta and var_meta.emitidos, terms)
+            _accumulate(out["validos"], meta.validos, rate_meta and rate_meta.validos,
+                        var_meta and var_meta.validos, terms)
+            acc_parties = out["parties"]
+            for pid in pids:
+                acc = acc_parties.get(pid)
+                if acc is None:
+                    acc = acc_parties[pid] = [0.0, 0.0, 0.0]
+                _accumulate(acc, parties.get(pid, _ZERO),
+                            rate_parties.get(pid, _ZERO) if terms else None,
+                            var_parties.get(pid, _ZERO) if var_meta else None, terms)
+        return out
+
+
+
+
+class Projector:
+    def __init__(self):
+        self._lock = threading.Lock()           # guards the published state
+        self._refresh_lock = threading.Lock()   # one refresh at a time
+        self._stats = _Stats()
+        self.version = None
+        self.last_refresh = {}
+
+    def refresh(self, dsn: str, full: bool = False):
+        """
+        Bring the statistics up to the current data version. Loading and
+        projecting work on a copy, outside the lock snapshot() takes, and
+        the result is swapped in at the end. While another thread refreshes,
+        callers get the previous projection at once ("in_progress": true)
+        instead of waiting; only a worker with no projection yet waits.
+        """
+        if not self._refresh_lock.acquire(blocking=self.version is None):
+            return dict(self.last_refresh, in_progress=True)
+        try:
+            start = time.perf_counter()
+            with get_connection(dsn) as conn, conn.cursor() as cur:
+                version = data_version(cur)
+                if not full and version == self.version:
+                    return self.last_refresh
+                if full or self.version is None:
+                    strata = None
+                    stats = _Stats()
+                else:
+                    # Strata of the mesas loaded since the last refresh
+                    cur.execute(f"""
+                        SELECT DISTINCT u.dept_id, u.muni_id, COALESCE(u.cdev, '') AS cdev
+                        FROM ubis u
+                        WHERE u.mesa IN ({MESAS_LOADED_SINCE})
+                    """, loaded_since(self.version))
+                    strata = {(r["dept_id"], r["muni_id"], r["cdev"]) for r in cur.fetchall()}
+                    stats = self._stats.copy()
+                tipos = set(stats.tipos)
+                affected = stats.load(cur, strata)
+                if stats.tipos != tipos:
+                    # A ballot seen for the first time needs every department
+                    affected = {s[0] for s in stats.strata}
+            stats.project(affected)
+            last_refresh = {
+                "data_version": list(version),
+                "mode": "full" if strata is None else "incremental",
+                "strata": len(stats.strata) if strata is None else len(strata),
+                "departments": len(affected),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 2),
+            }
+            with self._lock:
+                self._stats = stats
+                self.version = version
+                self.last_refresh = last_refresh
+            return last_refresh
+        finally:
+            self._refresh_lock.release()
+
+    def snapshot(self, tipo):
+        """{dept_id: raw totals} for one ballot, consistent with a single refresh."""
+        with self._lock:
+            stats = self._stats
+        return {d: r[tipo] for d, r in stats.dept_results.items() if tipo in r}
+
+
+def _accumulate(acc, var, rate_var, var_var, terms):
+    """
+    Add one stratum's [counted, projected, variance] for a variable to
+    ``acc``. ``terms`` is (uncounted padron / rate padron, any uncounted,
+    variance factor, variance-source padron sum and sum of squares), or
+    None when nothing is counted anywhere in the department.
+    """
+    acc[0] += var.s
+    if terms is None:
+        acc[1] += var.s
+        acc[2] = math.nan
+        return
+    scale, uncounted, k, vx, vxx = terms
+    acc[1] += var.s + rate_var.s * scale
+    if not uncounted:
+        return
+    if var_var is None:
+        acc[2] = math.nan
+        return
+    r = var_var.s / vx
+    s2 = var_var.ss - 2 * r * var_var.sx + r * r * vxx
+    if s2 > 0:
+        acc[2] += k * s2
+
+
+def _interval(counted, projected, variance):
+    if math.isnan(variance):
+        return None, None
+    half = Z95 * math.sqrt(variance)
+    return max(counted, projected - half), projected + half
+
+
+def _pct(value, total):
+    return (value / total * 100.0) if total > 0 else 0.0
+
+
+def format_level(raw, party_names):
+    """Turn raw [counted, projected, variance] sums into the response shape."""
+    padron = raw["padron"]
+    e_counted, e_hat, e_var = raw["emitidos"]
+    v_counted, v_hat, v_var = raw["validos"]
+    e_low, e_high = _interval(e_counted, e_hat, e_var)
+    parties = []
+    for pid, (counted, hat, var) in raw["parties"].items():
+        low, high = _interval(counted, hat, var)
+        parties.append({
+            "partido_id": pid,
+            "part_name": party_names.get(pid),
+            "votos_contados": int(counted),
+            "votos_proyectados": round(hat),
+            "votos_ic95": [round(low), round(high)] if low is not None else None,
+            "porcentaje": _pct(hat, v_hat),
+            "porcentaje_ic95": [_pct(low, v_hat), _pct(high, v_hat)] if low is not None else None,
+        })
+    parties.sort(key=lambda p: -p["votos_proyectados"])
+    return {
+        "mesas": raw["mesas"],
+        "mesas_contadas": raw["contadas"],
+        "avance": _pct(raw["contadas"], raw["mesas"]),
+        "empadronados": round(padron),
+        "emitidos_proyectados": round(e_hat),
+        "validos_proyectados": round(v_hat),
+        "participacion": _pct(e_hat, padron),
+        "participacion_ic95": [_pct(e_low, padron), _pct(e_high, padron)] if e_low is not None else None,
+        "parties": parties,
+    }
+
+
+def sum_levels(raws):
+    total = {
+        "mesas": 0, "contadas": 0, "padron": 0.0,
+        "emitidos": [0.0, 0.0, 0.0], "validos": [0.0, 0.0, 0.0], "parties": {},
+    }
+    for raw in raws:
+        total["mesas"] += raw["mesas"]
+        total["contadas"] += raw["contadas"]
+        total["padron"] += raw["padron"]
+        for key in ("emitidos", "validos"):
+            for i in range(3):
+                total[key][i] += raw[key][i]
+        for pid, vals in raw["parties"].items():
+            acc = total["parties"].setdefault(pid, [0.0, 0.0, 0.0])
+            for i in range(3):
+                acc[i] += vals[i]
+    return total
+
+
+# One per worker process
+projector = Projector()
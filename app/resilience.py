@@ -0,0 +1,326 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.errors
+from flask import current_app, g, jsonify, request, copy_current_request_context
+
+
+class DatabaseUnavailable(Exception):
+    """The request was not sent to the database; answer 503 + Retry-After."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Overloaded(DatabaseUnavailable):
+    pass
+
+
+class CircuitOpen(DatabaseUnavailable):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    At most ``max_concurrent`` requests at once per worker; up to ``max_queue``
+    more wait at most ``queue_timeout`` seconds for a slot, the rest are
+    rejected immediately with Overloaded.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._cond:
+            if self._active < self.max_concurrent:
+                self._active += 1
+                return
+            if self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("Too many requests in queue")
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise Overloaded("Timed out waiting for a slot")
+                    self._cond.wait(remaining)
+                self._active += 1
+            finally:
+                self._waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return {"active": self._active, "waiting": self._waiting, "rejected": self.rejected}
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive database failures and rejects for
+    ``cooldown`` seconds; then lets a single trial request through
+    (half-open) and closes again on its success.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+
+    def before(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.cooldown - (now - self._opened_at)
+            # A trial that never reported back is given up after one cooldown
+            trial_busy = self._trial_started is not None and now - self._trial_started < self.cooldown
+            if remaining > 0 or trial_busy:
+                raise CircuitOpen("Database circuit open", retry_after=max(1, int(remaining + 0.999)))
+            self._trial_started = now
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_started = None
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            state = "closed"
+            if self._opened_at is not None:
+                state = "half-open" if self._trial_started is not None else "open"
+            return {"state": state, "consecutive_failures": self._failures}
+
+
+class StaleStore:
+    """Last known good payload per key (LRU-bounded), plus in-flight refreshes."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._refreshing = set()
+        self.served = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, payload):
+        with self._lock:
+            self._items[key] = (payload, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def start_refresh(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "refreshing": len(self._refreshing), "served": self.served}
+
+
+def _state():
+    return current_app.extensions["resilience"]
+
+
+def self_limited(view):
+    """Mark a view that takes its own limiter slot (to fall back to stale data)."""
+    view.self_limited = True
+    return view
+
+
+def statement_timeout_ms():
+    """Server-side deadline for queries issued by the current endpoint."""
+    cfg = current_app.config
+    return cfg["STATEMENT_TIMEOUTS_MS"].get(request.endpoint, cfg["STATEMENT_TIMEOUT_MS"])
+
+
+def check_circuit():
+    """Called by get_connection() inside a request: fail fast while the circuit is open."""
+    state = current_app.extensions.get("resilience")
+    if state is not None and not g.get("db_used"):
+        state["breaker"].before()
+        g.db_used = True
+
+
+def is_outage(e):
+    """
+    Whether ``e`` means the database is unreachable and should count toward
+    the circuit breaker: connection-level errors (libpq errors without a
+    SQLSTATE, connection exceptions, too many connections, shutdowns). A
+    query cancelled by its statement_timeout does not: the database answered.
+    """
+    if not isinstance(e, psycopg2.OperationalError) or isinstance(e, psycopg2.errors.QueryCanceled):
+        return False
+    code = e.pgcode
+    return code is None or code[:2] in ("08", "53") or code.startswith("57P")
+
+
+def record_db_failure():
+    state = current_app.extensions.get("resilience")
+    if state is not None:
+        state["breaker"].failure()
+        g.db_failed = True
+
+
+def limited(fn):
+    """
+    Wrap ``fn`` so it runs holding a limiter slot. Self-limited views wrap
+    only the function that really queries, so requests that merely wait for
+    a coalesced computation (app/coalesce.py) do not hold slots.
+    """
+    def run():
+        with _state()["limiter"].slot():
+            return fn()
+    return run
+
+
+def serve_with_fallback(key, compute):
+    """
+    Run ``compute`` -> (payload, status); ``compute`` takes its own limiter
+    slot (see limited()). On success the payload becomes the last known good
+    value for ``key``; if the database is unavailable, overloaded or too
+    slow, that value is returned instead, flagged with "stale": true, and a
+    refresh is started in the background.
+    """
+    state = _state()
+    try:
+        payload, status = compute()
+    except (DatabaseUnavailable, psycopg2.OperationalError) as e:
+        stale = state["stale"].get(key) if current_app.config["STALE_RESULTS_ENABLED"] else None
+        if stale is None:
+            raise
+        if is_outage(e):
+            record_db_failure()
+        _refresh_in_background(state, key, compute)
+        payload, stored_at = stale
+        state["stale"].served += 1
+        headers = {
+            "Warning": '110 - "Response is Stale"',
+            "Retry-After": str(getattr(e, "retry_after", 1)),
+        }
+        return dict(payload, stale=True, stale_since=stored_at), 200, headers
+    if status == 200:
+        state["stale"].put(key, payload)
+    return payload, status, {}
+
+
+def _refresh_in_background(state, key, compute):
+    if not state["stale"].start_refresh(key):
+        return
+
+    @copy_current_request_context
+    def refresh():
+        try:
+            payload, status = compute()
+            state["breaker"].success()
+            if status == 200:
+                state["stale"].put(key, payload)
+        except DatabaseUnavailable:
+            pass
+        except psycopg2.OperationalError as e:
+            if is_outage(e):
+                state["breaker"].failure()
+            else:
+                state["breaker"].success()
+        except Exception:
+            current_app.logger.exception("Background refresh failed for %r", key)
+        finally:
+            state["stale"].end_refresh(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def init_app(app):
+    cfg = app.config
+    app.extensions["resilience"] = state = {
+        "limiter": ConcurrencyLimiter(cfg["LOAD_MAX_CONCURRENT"], cfg["LOAD_MAX_QUEUE"], cfg["LOAD_QUEUE_TIMEOUT_SECONDS"]),
+        "breaker": CircuitBreaker(cfg["CIRCUIT_FAILURE_THRESHOLD"], cfg["CIRCUIT_COOLDOWN_SECONDS"]),
+        "stale": StaleStore(cfg["STALE_MAX_ENTRIES"]),
+    }
+    limited = set(cfg["LOAD_LIMITED_BLUEPRINTS"])
+
+    @app.before_request
+    def _acquire_slot():
+        view = app.view_functions.get(request.endpoint)
+        if request.blueprint not in limited or getattr(view, "self_limited", False):
+            return None
+        state["limiter"].acquire()
+        g.limiter_slot = True
+        return None
+
+    @app.teardown_request
+    def _release_slot(exc):
+        if g.pop("limiter_slot", False):
+            state["limiter"].release()
+
+    @app.after_request
+    def _record_success(response):
+        if g.get("db_used") and not g.get("db_failed") and response.status_code < 500:
+            state["breaker"].success()
+        return response
+
+    @app.errorhandler(DatabaseUnavailable)
+    def _unavailable(e):
+        resp = jsonify({"error": "Service unavailable, try again shortly"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+
+    @app.errorhandler(psycopg2.OperationalError)
+    def _db_error(e):
+        # Connection failures and statement_timeout cancellations; only the
+        # former count toward the circuit breaker, the latter prove it is up
+        if is_outage(e):
+            record_db_failure()
+        else:
+            state["breaker"].success()
+        return _unavailable(DatabaseUnavailable(str(e), retry_after=cfg["CIRCUIT_COOLDOWN_SECONDS"]))
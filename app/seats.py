@@ -0,0 +1,162 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from .db import MESAS_LOADED_SINCE, get_connection, data_version, loaded_since
+
+# D'Hondt seat allocation from aggregated voto totals.
+#
+# Vote totals per (district, party) are cached per ballot together with the
+# data version they were computed at. When new actas arrive only the
+# districts of the newly loaded mesas are re-aggregated, and only their
+# allocations are recomputed; everything else is served from the cache.
+# Refreshes work on a copy outside the cache lock and swap it in, one per
+# ballot at a time; meanwhile other requests get the previous totals. Rows
+# corrected in place by UPDATE don't move the watermark, so a ballot is
+# rebuilt from scratch once its totals are ``rebuild_after`` seconds old.
+
+NATIONAL = "NACIONAL"
+
+# ballot tipo -> SQL expression giving the district of a ubis row ``u``
+DISTRICTS = {
+    "DIPUTADOS_DISTRITAL": "u.dept_id",
+    "DIPUTADOS_NACIONAL": f"'{NATIONAL}'",
+    "PARLAMENTO_CENTROAMERICANO": f"'{NATIONAL}'",
+    "CORPORACION_MUNICIPAL": "u.dept_id || ':' || u.muni_id",
+}
+
+MAX_ALLOCATIONS = 4096
+
+_lock = threading.Lock()  # guards _cache and _allocations
+_refresh_locks = {tipo: threading.Lock() for tipo in DISTRICTS}
+# tipo -> {"version": data version, "built_at": monotonic,
+#          "generation": n, "totals": {district: {partido_id: votes}},
+#          "stamps": {district: n}}; entries are replaced, never mutated
+_cache = {}
+# (tipo, district, seats) -> ((generation, stamp), allocation), oldest first
+_allocations = OrderedDict()
+
+
+def _aggregate(cur, tipo, districts=None):
+    expr = DISTRICTS[tipo]
+    where = "v.tipo = %s"
+    params = [tipo]
+    if districts is not None:
+        where += f" AND {expr} = ANY(%s)"
+        params.append(list(districts))
+    cur.execute(f"""
+        SELECT {expr} AS district, v.partido_id, COALESCE(SUM(v.voto), 0) AS votos
+        FROM voto v
+        JOIN ubis u ON u.mesa = v.mesa
+        WHERE {where}
+        GROUP BY 1, 2
+    """, params)
+    totals = {}
+    for r in cur.fetchall():
+        totals.setdefault(r["district"], {})[r["partido_id"]] = int(r["votos"])
+    return totals
+
+
+def _changed_districts(cur, tipo, since_version):
+    cur.execute(f"""
+        SELECT DISTINCT {DISTRICTS[tipo]} AS district
+        FROM ubis u
+        WHERE u.mesa IN ({MESAS_LOADED_SINCE})
+    """, loaded_since(since_version))
+    return {r["district"] for r in cur.fetchall()}
+
+
+def dhondt(votes, seats: int):
+    """
+    Allocate ``seats`` among {partido_id: votes}. All quotients v/1..v/seats
+    are generated in one batch and the ``seats`` largest win; ties go to the
+    party with more votes, then the lower partido_id. Returns
+    ({partido_id: seats}, last winning quotient).
+    """
+    quotients = (
+        (v / d, v, -pid, pid)
+        for pid, v in votes.items() if v > 0
+        for d in range(1, seats + 1)
+    )
+    winners = heapq.nlargest(seats, quotients)
+    won = {}
+    for _, _, _, pid in winners:
+        won[pid] = won.get(pid, 0) + 1
+    return won, (winners[-1][0] if winners else None)
+
+
+def _refresh(dsn: str, tipo: str, rebuild_after=None):
+    """
+    Bring the totals of ``tipo`` up to the current data version. Returns
+    (entry, districts re-aggregated, in_progress); in_progress means another
+    thread is refreshing and ``entry`` is the previous one.
+    """
+    lock = _refresh_locks[tipo]
+    if not lock.acquire(blocking=tipo not in _cache):
+        return _cache[tipo], 0, True
+    try:
+        entry = _cache.get(tipo)
+        with get_connection(dsn) as conn, conn.cursor() as cur:
+            version = data_version(cur)
+            if entry is None or (rebuild_after and time.monotonic() - entry["built_at"] >= rebuild_after):
+                built_at = time.monotonic()
+                totals = _aggregate(cur, tipo)
+                fresh = {
+                    "version": version,
+                    "built_at": built_at,
+                    "generation": entry["generation"] + 1 if entry else 0,
+                    "totals": totals,
+                    "stamps": {},
+                }
+                refreshed = len(totals)
+            elif version != entry["version"]:
+                changed = _changed_districts(cur, tipo, entry["version"])
+                totals, stamps = dict(entry["totals"]), dict(entry["stamps"])
+                if changed:
+                    updated = _aggregate(cur, tipo, changed)
+                    for district in changed:
+                        totals[district] = updated.get(district, {})
+                        stamps[district] = stamps.get(district, 0) + 1
+                fresh = dict(entry, version=version, totals=totals, stamps=stamps)
+                refreshed = len(changed)
+            else:
+                fresh = entry
+                refreshed = 0
+        with _lock:
+            _cache[tipo] = fresh
+        return fresh, refreshed, False
+    finally:
+        lock.release()
+
+
+def allocate(dsn: str, tipo: str, seats_by_district, rebuild_after=None):
+    """
+    Seats per party for every district in ``seats_by_district``
+    ({district: seats}). Returns (data version, {district: allocation},
+    number of districts whose totals were re-aggregated, in_progress).
+    """
+    entry, refreshed, in_progress = _refresh(dsn, tipo, rebuild_after)
+    out = {}
+    for district, seats in seats_by_district.items():
+        key = (tipo, district, seats)
+        stamp = (entry["generation"], entry["stamps"].get(district, 0))
+        with _lock:
+            cached = _allocations.get(key)
+            if cached is not None:
+                _allocations.move_to_end(key)
+        if cached is None or cached[0] != stamp:
+            votes = entry["totals"].get(district, {})
+            won, last_quotient = dhondt(votes, seats)
+            rows = sorted(
+                ({"partido_id": pid, "votos": v, "seats": won.get(pid, 0)} for pid, v in votes.items()),
+                key=lambda r: (-r["seats"], -r["votos"], r["partido_id"]),
+            )
+            cached = (stamp, {"votos": sum(votes.values()), "last_quotient": last_quotient, "parties": rows})
+            with _lock:
+                _allocations[key] = cached
+                _allocations.move_to_end(key)
+                while len(_allocations) > MAX_ALLOCATIONS:
+                    _allocations.popitem(last=False)
+        out[district] = cached[1]
+    return entry["version"], out, refreshed, in_progress
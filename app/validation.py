@@ -0,0 +1,193 @@
+from .db import MESAS_LOADED_SINCE, data_version, loaded_since
+
+# Acta consistency rules, evaluated per (mesa, tipo) over metadata joined
+# with the per-mesa sum of voto. Each rule is
+#   (code, reported expression, expected expression, comparison, description)
+# where comparison "eq" flags reported <> expected and "le" flags
+# reported > expected. A rule is skipped for a row when either side is NULL.
+RULES = [
+    ("validos_votos", "c.validos", "c.votos", "eq",
+     "Válidos no coincide con la suma de votos por partido"),
+    ("validos_calculado", "c.validos", "c.validos_calculado", "eq",
+     "Válidos no coincide con válidos calculado"),
+    ("emitidos_calculado", "c.emitidos", "c.emitidos_calculado", "eq",
+     "Emitidos no coincide con emitidos calculado"),
+    ("total_calculado", "c.total", "c.total_calculado", "eq",
+     "Total no coincide con total calculado"),
+    ("emitidos_desglose", "c.emitidos", "c.validos + c.nulos + c.en_blanco", "eq",
+     "Emitidos no coincide con válidos + nulos + en blanco"),
+    ("emitidos_padron", "c.emitidos", "c.padron", "le",
+     "Emitidos excede el padrón"),
+    ("papeletas", "c.total + c.papeletas_no_usadas", "c.papeletas_recibidas", "le",
+     "Papeletas usadas + no usadas excede las recibidas"),
+    ("negativos",
+     "LEAST(c.padron, c.validos, c.nulos, c.en_blanco, c.emitidos, c.invalidos, c.total,"
+     " c.impugnaciones, c.papeletas_recibidas, c.papeletas_no_usadas, c.votos)", "0", "ge",
+     "Conteo negativo"),
+]
+RULE_DESCRIPTIONS = {code: desc for code, _, _, _, desc in RULES}
+
+_FAILS = {
+    "eq": "{r} <> {e}",
+    "le": "{r} > {e}",
+    "ge": "{r} < {e}",
+}
+
+
+def _rules_values_sql():
+    rows = []
+    for code, reported, expected, cmp, _ in RULES:
+        failed = _FAILS[cmp].format(r=f"({reported})", e=f"({expected})")
+        rows.append(f"('{code}', ({reported})::bigint, ({expected})::bigint, COALESCE({failed}, false))")
+    return ",\n                ".join(rows)
+
+
+# One set-based pass: every (mesa, tipo) in scope is joined once with its
+# voto sum and unpivoted against all rules; only failures are kept.
+_CHECK_SQL = f"""
+    WITH scope AS (
+        {{scope}}
+    ),
+    votos AS (
+        SELECT v.mesa, v.tipo, SUM(v.voto) AS votos
+        FROM voto v
+        JOIN scope s ON s.mesa = v.mesa
+        GROUP BY v.mesa, v.tipo
+    ),
+    checked AS (
+        SELECT m.*, vs.votos
+        FROM metadata m
+        JOIN scope s ON s.mesa = m.mesa
+        LEFT JOIN votos vs ON vs.mesa = m.mesa AND vs.tipo = m.tipo
+    )
+    INSERT INTO acta_anomalies (mesa, tipo, rule, reported, expected)
+    SELECT c.mesa, c.tipo, r.rule, r.reported, r.expected
+    FROM checked c
+    CROSS JOIN LATERAL (VALUES
+                {_rules_values_sql()}
+    ) AS r(rule, reported, expected, failed)
+    WHERE r.failed
+    ON CONFLICT (mesa, tipo, rule) DO NOTHING
+"""
+
+_FULL_SCOPE = "SELECT mesa FROM ubis"
+
+
+def run_check(conn, full: bool = False, wait: bool = True):
+    """
+    Check acta consistency and store failures in acta_anomalies.
+
+    Incremental (default) re-checks only mesas with metadata/voto rows loaded
+    since the last run; ``full`` re-checks everything, which also catches
+    rows corrected in place by UPDATE. With ``wait=False`` a check already
+    running elsewhere is not waited for: mode "busy" is returned and the
+    stored anomalies are left as they are. Returns a summary dict.
+    """
+    with conn.cursor() as cur:
+        # Serialize checkers; a second caller waits for the first, or skips
+        if wait:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('acta_anomalies'))")
+        else:
+            cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('acta_anomalies')) AS locked")
+            if not cur.fetchone()["locked"]:
+                conn.commit()
+                return {"mode": "busy", "mesas_checked": 0, "data_version": None}
+        cur.execute("SELECT metadata_id, voto_id FROM acta_check_state FOR UPDATE")
+        state = cur.fetchone() or {"metadata_id": 0, "voto_id": 0}
+        checked_version = (state["metadata_id"], state["voto_id"])
+        version = data_version(cur)
+
+        if not full and checked_version == version:
+            conn.commit()
+            return {"mode": "incremental", "mesas_checked": 0, "data_version": list(version)}
+
+        if full:
+            cur.execute("TRUNCATE acta_anomalies")
+            scope, params = _FULL_SCOPE, {}
+        else:
+            # Mesas touched since the last check
+            scope, params = MESAS_LOADED_SINCE, loaded_since(checked_version)
+            cur.execute(f"DELETE FROM acta_anomalies WHERE mesa IN ({scope})", params)
+
+        cur.execute(f"SELECT COUNT(*) AS n FROM ({scope}) s", params)
+        checked = cur.fetchone()["n"]
+        cur.execute(_CHECK_SQL.format(scope=scope), params)
+
+        cur.execute("""
+            INSERT INTO acta_check_state (id, metadata_id, voto_id, checked_at)
+            VALUES (true, %s, %s, now())
+            ON CONFLICT (id) DO UPDATE
+                SET metadata_id = EXCLUDED.metadata_id,
+                    voto_id = EXCLUDED.voto_id,
+                    checked_at = EXCLUDED.checked_at
+        """, version)
+    conn.commit()
+    return {"mode": "full" if full else "incremental", "mesas_checked": checked, "data_version": list(version)}
+
+
+def anomaly_report(conn, dept_id: str = "", muni_id: str = ""):
+    """
+    Anomaly counts by department -> municipality -> rule. When a municipality
+    is given, the individual failing (mesa, tipo, rule) rows are included.
+    """
+    where, params = [], []
+    if dept_id:
+        where.append("u.dept_id = %s")
+        params.append(dept_id)
+    if muni_id:
+        where.append("u.muni_id = %s")
+        params.append(muni_id)
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT metadata_id, voto_id, checked_at FROM acta_check_state")
+        state = cur.fetchone()
+
+        cur.execute(f"""
+            SELECT u.dept_id, u.dept_name, u.muni_id, u.muni_name, a.rule,
+                   COUNT(*) AS anomalies, COUNT(DISTINCT a.mesa) AS mesas
+            FROM acta_anomalies a
+            JOIN ubis u ON u.mesa = a.mesa
+            {where_sql}
+            GROUP BY u.dept_id, u.dept_name, u.muni_id, u.muni_name, a.rule
+            ORDER BY u.dept_name, u.muni_name, a.rule
+        """, params)
+        rows = cur.fetchall()
+
+        details = None
+        if dept_id and muni_id:
+            cur.execute(f"""
+                SELECT a.mesa, u.cdev, a.tipo, a.rule, a.reported, a.expected
+                FROM acta_anomalies a
+                JOIN ubis u ON u.mesa = a.mesa
+                {where_sql}
+                ORDER BY a.mesa, a.tipo, a.rule
+            """, params)
+            details = [dict(r) for r in cur.fetchall()]
+
+    departments = {}
+    for r in rows:
+        dept = departments.setdefault(r["dept_id"], {
+            "dept_id": r["dept_id"], "dept_name": r["dept_name"],
+            "anomalies": 0, "municipalities": {},
+        })
+        muni = dept["municipalities"].setdefault(r["muni_id"], {
+            "muni_id": r["muni_id"], "muni_name": r["muni_name"],
+            "anomalies": 0, "by_rule": {},
+        })
+        muni["by_rule"][r["rule"]] = {"anomalies": r["anomalies"], "mesas": r["mesas"]}
+        muni["anomalies"] += r["anomalies"]
+        dept["anomalies"] += r["anomalies"]
+
+    report = {
+        "checked_at": state["checked_at"].isoformat() if state and state["checked_at"] else None,
+        "data_version": [state["metadata_id"], state["voto_id"]] if state else None,
+        "rules": RULE_DESCRIPTIONS,
+        "departments": [
+            dict(d, municipalities=list(d["municipalities"].values()))
+            for d in departments.values()
+        ],
+    }
+    if details is not None:
+        report["details"] = details
+    return report
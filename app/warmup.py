@@ -0,0 +1,159 @@
+import threading
+import time
+
+from flask import current_app, jsonify
+
+from .db import get_connection, cached_data_version, data_version, warm_pool
+from .lookups import get_lookups
+
+# Startup warm-up: open pooled connections, load the lookups/bootstrap
+# payload and precompute /v2/results for the largest municipalities, so a
+# new worker's first requests don't pay for cold caches. The precomputed
+# payloads are served (see preloaded_results) until the data version moves.
+# /readyz reports 503 until it has finished; /healthz stays a plain
+# liveness check.
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.steps = {}
+        self.errors = {}
+        # /v2/results payloads computed at data version preloaded_version
+        self.preloaded = {}
+        self.preloaded_version = None
+
+    def as_dict(self):
+        return {
+            "ready": self.ready.is_set(),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": dict(self.steps),
+            "errors": dict(self.errors),
+        }
+
+
+def _step(state, name, fn):
+    start = time.perf_counter()
+    try:
+        state.steps[name] = {"result": fn()}
+    except Exception as e:
+        # A failed step doesn't block readiness: the request path has its own
+        # fallbacks, and a DB outage would otherwise keep every worker out
+        state.errors[name] = str(e).strip()
+        state.steps[name] = {"result": None}
+    state.steps[name]["elapsed_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+
+
+def preloaded_results(key, version):
+    """
+    The warm-up payload for a /v2/results ``key`` if it was computed at data
+    ``version``, else None. Once the version moves they are all dropped.
+    """
+    state = current_app.extensions.get("warmup")
+    if state is None or not state.preloaded:
+        return None
+    if state.preloaded_version != tuple(version):
+        # Ids only grow: drop the payloads once a newer batch is seen
+        if all(v >= p for v, p in zip(version, state.preloaded_version)):
+            state.preloaded = {}
+        return None
+    return state.preloaded.get(key)
+
+
+def _preload_results(app, lookups, state):
+    """
+    Precompute /v2/results for every party in the top municipalities; they
+    are served until the next batch and kept as last known good values.
+    """
+    from .api import _ballot_results, _metadata_sums, _party_votes
+
+    cfg = app.config
+    combos = list(cfg["WARMUP_MUNICIPALITIES"])
+    stale = app.extensions["resilience"]["stale"]
+    timeout = cfg["WARMUP_STATEMENT_TIMEOUT_MS"]
+    preloaded = {}
+
+    with get_connection(cfg["DATABASE_URL"], statement_timeout_ms=timeout) as conn, conn.cursor() as cur:
+        # Read before the aggregates: a batch landing meanwhile only makes
+        # the payloads look older than they are, never newer
+        version = data_version(cur)
+        if cfg["WARMUP_TOP_MUNICIPALITIES"] > 0:
+            cur.execute("""
+                SELECT dept_id, muni_id
+                FROM ubis
+                WHERE dept_id IS NOT NULL AND muni_id IS NOT NULL
+                GROUP BY dept_id, muni_id
+                ORDER BY COUNT(*) DESC
+                LIMIT %s
+            """, (cfg["WARMUP_TOP_MUNICIPALITIES"],))
+            combos += [(r["dept_id"], r["muni_id"]) for r in cur.fetchall()]
+
+        for dept_id, muni_id in dict.fromkeys(combos):
+            cur.execute("SELECT mesa FROM ubis WHERE dept_id = %s AND muni_id = %s", (dept_id, muni_id))
+            mesas = [r["mesa"] for r in cur.fetchall()]
+            if not mesas:
+                continue
+            meta = _metadata_sums(cur, mesas)
+            # All parties in one pass instead of one query per party
+            votes = _party_votes(cur, mesas)
+
+            for partido_id, part_name in lookups["party_names"].items():
+                key = ("results_v2", dept_id, muni_id, partido_id)
+                preloaded[key] = {
+                    "dept_id": dept_id,
+                    "muni_id": muni_id,
+                    "partido_id": partido_id,
+                    "dept_name": lookups["dept_names"].get(dept_id),
+                    "muni_name": lookups["muni_names"].get((dept_id, muni_id)),
+                    "part_name": part_name,
+                    "results": _ballot_results(meta, votes.get(partido_id, {})),
+                }
+                stale.put(key, preloaded[key])
+    state.preloaded_version = tuple(version)
+    state.preloaded = preloaded
+    return {"municipalities": len(dict.fromkeys(combos)), "payloads": len(preloaded),
+            "data_version": list(version)}
+
+
+def run(app, state):
+    cfg = app.config
+    dsn = cfg["DATABASE_URL"]
+    state.started_at = time.time()
+    try:
+        with app.app_context():
+            _step(state, "connections", lambda: warm_pool(dsn, cfg["DB_POOL_SIZE"]))
+            lookups = {}
+
+            def load_lookups():
+                lookups.update(get_lookups(dsn, cfg["LOOKUP_TTL_SECONDS"], force=True))
+                return {"departments": len(lookups["departments"]), "parties": len(lookups["parties"])}
+
+            _step(state, "lookups", load_lookups)
+            _step(state, "data_version", lambda: list(cached_data_version(dsn, cfg["DATA_VERSION_TTL_SECONDS"])))
+            if lookups:
+                _step(state, "results", lambda: _preload_results(app, lookups, state))
+    finally:
+        state.finished_at = time.time()
+        state.ready.set()
+
+
+def init_app(app, enabled=None):
+    state = app.extensions["warmup"] = WarmupState()
+    if enabled is None:
+        enabled = app.config["WARMUP_ENABLED"]
+
+    @app.get("/readyz")
+    def readyz():
+        body = state.as_dict()
+        return jsonify(body), (200 if body["ready"] else 503)
+
+    if not enabled or not app.config["DATABASE_URL"]:
+        state.ready.set()
+    elif app.config["WARMUP_BACKGROUND"]:
+        threading.Thread(target=run, args=(app, state), name="warmup", daemon=True).start()
+    else:
+        run(app, state)
+    return state
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Latency comparison: name-keyed vs ID-keyed /results queries
+"""
+import os
+import sys
+import statistics
+import time
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+load_dotenv()
+
+RUNS = int(os.getenv("BENCH_RUNS", "20"))
+SAMPLES = int(os.getenv("BENCH_SAMPLES", "10"))
+
+
+def _time_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000.0
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(f"  {label:<6} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   n={len(timings)}")
+
+
+def bench():
+    """Run the mesa + aggregate queries of /results and /v2/results for sample municipalities"""
+    from app.db import get_connection
+    from app.config import Config
+    from app.api import _aggregate_results
+
+    dsn = Config().DATABASE_URL
+    if not dsn:
+        print("❌ DATABASE_URL not set")
+        return False
+
+    with get_connection(dsn) as conn:
+        with conn.cursor() as cur:
+            # Largest municipalities first: those are the slow ones
+            cur.execute("""
+                SELECT dept_id, dept_name, muni_id, muni_name, COUNT(*) AS mesas
+                FROM ubis
+                GROUP BY dept_id, dept_name, muni_id, muni_name
+                ORDER BY mesas DESC
+                LIMIT %s
+            """, (SAMPLES,))
+            samples = cur.fetchall()
+            cur.execute("SELECT partido_id, partido_name FROM partido ORDER BY partido_id LIMIT 1")
+            party = cur.fetchone()
+            if not samples or not party:
+                print("❌ No data to benchmark")
+                return False
+
+            def by_name(s):
+                cur.execute("SELECT mesa FROM ubis WHERE dept_name = %s AND muni_name = %s",
+                            (s["dept_name"], s["muni_name"]))
+                mesas = [r["mesa"] for r in cur.fetchall()]
+                cur.execute("SELECT partido_id FROM partido WHERE partido_name = %s",
+                            (party["partido_name"],))
+                _aggregate_results(cur, mesas, cur.fetchone()["partido_id"])
+
+            def by_id(s):
+                cur.execute("SELECT mesa FROM ubis WHERE dept_id = %s AND muni_id = %s",
+                            (s["dept_id"], s["muni_id"]))
+                mesas = [r["mesa"] for r in cur.fetchall()]
+                _aggregate_results(cur, mesas, party["partido_id"])
+
+            names, ids = [], []
+            for _ in range(RUNS):
+                for s in samples:
+                    names.append(_time_ms(lambda: by_name(s)))
+                    ids.append(_time_ms(lambda: by_id(s)))
+
+    print(f"📊 /results query latency ({len(samples)} municipalities x {RUNS} runs)")
+    _report("names", names)
+    _report("ids", ids)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if bench() else 1)
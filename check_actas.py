@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Acta consistency check - runs the validation rules and prints the anomaly report
+"""
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--full", action="store_true",
+                        help="re-check every mesa instead of only newly loaded ones")
+    parser.add_argument("--dept-id", default="", help="limit the report to a department")
+    parser.add_argument("--muni-id", default="", help="limit the report to a municipality")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    from app.db import get_connection
+    from app.config import Config
+    from app.validation import run_check, anomaly_report
+
+    dsn = Config().DATABASE_URL
+    if not dsn:
+        print("❌ DATABASE_URL not set")
+        return False
+
+    with get_connection(dsn) as conn:
+        check = run_check(conn, full=args.full)
+        report = anomaly_report(conn, args.dept_id, args.muni_id)
+
+    if args.json:
+        report["last_check"] = check
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        return True
+
+    print(f"🔍 {check['mode']} check: {check['mesas_checked']} mesas checked "
+          f"(data version {check['data_version']})")
+    if not report["departments"]:
+        print("✅ No anomalies")
+        return True
+    for dept in report["departments"]:
+        print(f"\n{dept['dept_name']} ({dept['dept_id']}): {dept['anomalies']} anomalies")
+        for muni in dept["municipalities"]:
+            rules = ", ".join(f"{rule}={v['anomalies']}" for rule, v in muni["by_rule"].items())
+            print(f"  {muni['muni_name']} ({muni['muni_id']}): {rules}")
+    for row in report.get("details", []):
+        print(f"  mesa {row['mesa']} {row['tipo']}: {row['rule']} "
+              f"(reportado {row['reported']}, esperado {row['expected']})")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Database diagnostics - table sizes, index usage, bloat, cache hit ratio,
+connections and endpoint query latency, as JSON
+"""
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+load_dotenv()
+
+
+def main():
+    from app.diagnostics import PROBES, run, environment
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("probes", nargs="*",
+                        help=f"probes to run: {', '.join(PROBES)} (default: all)")
+    parser.add_argument("--timeout", type=float, default=5.0,
+                        help="per-probe deadline in seconds (default: 5)")
+    args = parser.parse_args()
+    unknown = [p for p in args.probes if p not in PROBES]
+    if unknown:
+        parser.error(f"unknown probes: {', '.join(unknown)}")
+
+    from app.config import Config
+    report = run(Config().DATABASE_URL, probes=args.probes or None, timeout=args.timeout)
+    report["environment"] = environment()
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    return report["ok"]
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
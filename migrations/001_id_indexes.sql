@@ -0,0 +1,22 @@
+-- Indexes backing the ID-keyed API (/v2/*) and the per-mesa aggregates
+-- shared with the name-keyed endpoints.
+--
+-- CONCURRENTLY so it can be applied to the live database without blocking
+-- the loaders; run it outside a transaction:
+--   psql "$DATABASE_URL" -f migrations/001_id_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ubis_dept_id_muni_id_idx
+    ON public.ubis USING btree (dept_id, muni_id) INCLUDE (mesa);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ubis_dept_name_muni_name_idx
+    ON public.ubis USING btree (dept_name, muni_name) INCLUDE (mesa);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS metadata_mesa_tipo_idx
+    ON public.metadata USING btree (mesa, tipo);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS voto_partido_id_mesa_tipo_idx
+    ON public.voto USING btree (partido_id, mesa, tipo) INCLUDE (voto);
+
+ANALYZE public.ubis;
+ANALYZE public.metadata;
+ANALYZE public.voto;
@@ -0,0 +1,10 @@
+-- Index backing the voting-center drill-down (/v2/cdevs): per-cdev
+-- grouping within a municipality. The per-mesa metadata/voto lookups use
+-- the indexes from 001; /v2/mesas pages use mesa_metrics (005).
+--
+--   psql "$DATABASE_URL" -f migrations/002_cdev_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ubis_dept_id_muni_id_cdev_mesa_idx
+    ON public.ubis USING btree (dept_id, muni_id, cdev, mesa);
+
+ANALYZE public.ubis;
@@ -0,0 +1,19 @@
+-- Storage for the acta consistency checker (app/validation.py).
+--   psql "$DATABASE_URL" -f migrations/003_acta_anomalies.sql
+
+CREATE TABLE IF NOT EXISTS public.acta_anomalies (
+    mesa integer NOT NULL REFERENCES public.ubis(mesa) DEFERRABLE,
+    tipo text NOT NULL,
+    rule text NOT NULL,
+    reported bigint,
+    expected bigint,
+    PRIMARY KEY (mesa, tipo, rule)
+);
+
+-- Single row: ids of the last metadata/voto rows that were checked
+CREATE TABLE IF NOT EXISTS public.acta_check_state (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    metadata_id integer NOT NULL DEFAULT 0,
+    voto_id integer NOT NULL DEFAULT 0,
+    checked_at timestamp with time zone
+);
@@ -0,0 +1,35 @@
+-- Versioned results history (app/history.py): one row per recorded data
+-- version plus, per municipality, the change in metadata sums and party
+-- votes against the previous version.
+--   psql "$DATABASE_URL" -f migrations/004_results_history.sql
+
+CREATE TABLE IF NOT EXISTS public.results_versions (
+    version_id serial PRIMARY KEY,
+    metadata_id integer NOT NULL,
+    voto_id integer NOT NULL,
+    recorded_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS results_versions_recorded_at_idx
+    ON public.results_versions USING btree (recorded_at);
+
+CREATE TABLE IF NOT EXISTS public.results_meta_delta (
+    version_id integer NOT NULL REFERENCES public.results_versions(version_id) ON DELETE CASCADE,
+    dept_id text NOT NULL,
+    muni_id text NOT NULL,
+    tipo text NOT NULL,
+    padron bigint NOT NULL,
+    validos bigint NOT NULL,
+    emitidos bigint NOT NULL,
+    PRIMARY KEY (dept_id, muni_id, tipo, version_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.results_vote_delta (
+    version_id integer NOT NULL REFERENCES public.results_versions(version_id) ON DELETE CASCADE,
+    dept_id text NOT NULL,
+    muni_id text NOT NULL,
+    tipo text NOT NULL,
+    partido_id integer NOT NULL,
+    votos bigint NOT NULL,
+    PRIMARY KEY (dept_id, muni_id, partido_id, tipo, version_id)
+);
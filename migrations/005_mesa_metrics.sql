@@ -0,0 +1,159 @@
+-- Per-mesa metrics for the /v2/mesas keyset pages (app/drilldown.py).
+--
+-- One row per (mesa, tipo) with its municipality and the metadata sums,
+-- turnout and efficiency as stored columns, kept in sync with metadata by
+-- statement-level triggers. The (dept_id, muni_id, tipo, <sort>, mesa)
+-- indexes let every page seek straight to its first row and stop after
+-- LIMIT rows, whatever the sort and however deep the page.
+--
+-- Like 001/002 it can be applied to the live database: the triggers are
+-- created first, each in its own short transaction (CREATE TRIGGER waits
+-- for running loads and briefly blocks new ones), then the table is
+-- backfilled in batches that commit as they go. Rows loaded meanwhile are
+-- written by the triggers, and the backfill never overwrites them. Run it
+-- outside a transaction:
+--   psql "$DATABASE_URL" -f migrations/005_mesa_metrics.sql
+
+CREATE TABLE IF NOT EXISTS public.mesa_metrics (
+    mesa integer NOT NULL,
+    tipo text NOT NULL,
+    dept_id text,
+    muni_id text,
+    cdev text,
+    padron bigint NOT NULL,
+    validos bigint NOT NULL,
+    emitidos bigint NOT NULL,
+    participacion double precision GENERATED ALWAYS AS (
+        CASE WHEN padron > 0 THEN emitidos::double precision / padron * 100.0 ELSE 0.0 END) STORED,
+    eficiencia double precision GENERATED ALWAYS AS (
+        CASE WHEN emitidos > 0 THEN validos::double precision / emitidos * 100.0 ELSE 0.0 END) STORED,
+    PRIMARY KEY (mesa, tipo)
+);
+
+CREATE INDEX IF NOT EXISTS mesa_metrics_muni_mesa_idx
+    ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, mesa);
+CREATE INDEX IF NOT EXISTS mesa_metrics_muni_participacion_idx
+    ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, participacion, mesa);
+CREATE INDEX IF NOT EXISTS mesa_metrics_muni_eficiencia_idx
+    ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, eficiencia, mesa);
+
+-- Recompute the rows of the given mesas from metadata
+CREATE OR REPLACE FUNCTION public.mesa_metrics_refresh(mesas integer[]) RETURNS void
+    LANGUAGE sql
+    AS $$
+    INSERT INTO public.mesa_metrics (mesa, tipo, dept_id, muni_id, cdev, padron, validos, emitidos)
+    SELECT m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev,
+           COALESCE(SUM(m.padron), 0), COALESCE(SUM(m.validos), 0), COALESCE(SUM(m.emitidos), 0)
+    FROM public.metadata m
+    JOIN public.ubis u ON u.mesa = m.mesa
+    WHERE m.mesa = ANY(mesas) AND m.tipo IS NOT NULL
+    GROUP BY m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev
+    ON CONFLICT (mesa, tipo) DO UPDATE
+        SET dept_id = EXCLUDED.dept_id,
+            muni_id = EXCLUDED.muni_id,
+            cdev = EXCLUDED.cdev,
+            padron = EXCLUDED.padron,
+            validos = EXCLUDED.validos,
+            emitidos = EXCLUDED.emitidos;
+    DELETE FROM public.mesa_metrics mm
+    WHERE mm.mesa = ANY(mesas)
+      AND NOT EXISTS (SELECT 1 FROM public.metadata m JOIN public.ubis u ON u.mesa = m.mesa
+                      WHERE m.mesa = mm.mesa AND m.tipo = mm.tipo);
+$$;
+
+CREATE OR REPLACE FUNCTION public.mesa_metrics_sync() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT DISTINCT mesa FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM new_rows UNION SELECT mesa FROM old_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT DISTINCT mesa FROM old_rows));
+    ELSE
+        DELETE FROM public.mesa_metrics;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- A mesa moved to another municipality or voting center (or whose ubis row
+-- arrives after its metadata) takes its rows along
+CREATE OR REPLACE FUNCTION public.mesa_metrics_ubis_sync() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(
+            SELECT mesa FROM (SELECT mesa, dept_id, muni_id, cdev FROM new_rows
+                              EXCEPT SELECT mesa, dept_id, muni_id, cdev FROM old_rows) moved
+            UNION
+            SELECT mesa FROM (SELECT mesa, dept_id, muni_id, cdev FROM old_rows
+                              EXCEPT SELECT mesa, dept_id, muni_id, cdev FROM new_rows) left_behind));
+    ELSE
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM old_rows));
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS metadata_mesa_metrics_insert ON public.metadata;
+CREATE TRIGGER metadata_mesa_metrics_insert AFTER INSERT ON public.metadata
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+DROP TRIGGER IF EXISTS metadata_mesa_metrics_update ON public.metadata;
+CREATE TRIGGER metadata_mesa_metrics_update AFTER UPDATE ON public.metadata
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+DROP TRIGGER IF EXISTS metadata_mesa_metrics_delete ON public.metadata;
+CREATE TRIGGER metadata_mesa_metrics_delete AFTER DELETE ON public.metadata
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+DROP TRIGGER IF EXISTS metadata_mesa_metrics_truncate ON public.metadata;
+CREATE TRIGGER metadata_mesa_metrics_truncate AFTER TRUNCATE ON public.metadata
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+DROP TRIGGER IF EXISTS ubis_mesa_metrics_insert ON public.ubis;
+CREATE TRIGGER ubis_mesa_metrics_insert AFTER INSERT ON public.ubis
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+DROP TRIGGER IF EXISTS ubis_mesa_metrics_update ON public.ubis;
+CREATE TRIGGER ubis_mesa_metrics_update AFTER UPDATE ON public.ubis
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+DROP TRIGGER IF EXISTS ubis_mesa_metrics_delete ON public.ubis;
+CREATE TRIGGER ubis_mesa_metrics_delete AFTER DELETE ON public.ubis
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+-- Backfill in batches of mesas, committing each. DO NOTHING: a row that
+-- already exists was written by a trigger from a newer snapshot than ours.
+DO $$
+DECLARE
+    lo integer := (SELECT MIN(mesa) FROM public.metadata);
+    hi integer := (SELECT MAX(mesa) FROM public.metadata);
+BEGIN
+    WHILE lo <= hi LOOP
+        INSERT INTO public.mesa_metrics (mesa, tipo, dept_id, muni_id, cdev, padron, validos, emitidos)
+        SELECT m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev,
+               COALESCE(SUM(m.padron), 0), COALESCE(SUM(m.validos), 0), COALESCE(SUM(m.emitidos), 0)
+        FROM public.metadata m
+        JOIN public.ubis u ON u.mesa = m.mesa
+        WHERE m.mesa >= lo AND m.mesa < lo + 1000 AND m.tipo IS NOT NULL
+        GROUP BY m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev
+        ON CONFLICT (mesa, tipo) DO NOTHING;
+        COMMIT;
+        lo := lo + 1000;
+    END LOOP;
+END
+$$;
+
+ANALYZE public.mesa_metrics;
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Results history - records the current data version as a results snapshot.
+Versions are stamped with the time they are recorded, so run this after every
+load or keep it running with --watch; as_of answers are only as precise as that.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(__file__))
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--watch", type=float, default=0, metavar="SECONDS",
+                        help="keep polling and record every new batch")
+    parser.add_argument("--full", action="store_true",
+                        help="compare every municipality once, to record rows corrected in place")
+    parser.add_argument("--json", action="store_true", help="print each summary as JSON")
+    args = parser.parse_args()
+
+    from app.db import get_connection
+    from app.config import Config
+    from app.history import record
+
+    dsn = Config().DATABASE_URL
+    if not dsn:
+        print("❌ DATABASE_URL not set")
+        return False
+
+    full = args.full
+    while True:
+        try:
+            with get_connection(dsn) as conn:
+                info = record(conn, full=full)
+        except psycopg2.Error as e:
+            # One bad batch or a dropped connection shouldn't stop the watcher
+            if not args.watch:
+                raise
+            print(f"❌ {str(e).strip()}", flush=True)
+            time.sleep(args.watch)
+            continue
+        full = False
+        if args.json:
+            print(json.dumps(info), flush=True)
+        elif info["recorded"]:
+            print(f"📸 version {info['version']} (data version {info['data_version']}): "
+                  f"{info['municipalities']} municipalities, "
+                  f"{info['meta_rows']} metadata / {info['vote_rows']} vote deltas", flush=True)
+        elif not args.watch:
+            print(f"✅ Up to date at version {info['version']}")
+        if not args.watch:
+            return True
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
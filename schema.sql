@@ -18,10 +18,149 @@ SET xmloption = content;
 SET client_min_messages = warning;
 SET row_security = off;
 
+--
+-- Name: mesa_metrics_refresh(integer[]); Type: FUNCTION; Schema: public; Owner: postgres
+--
+
+CREATE FUNCTION public.mesa_metrics_refresh(mesas integer[]) RETURNS void
+    LANGUAGE sql
+    AS $$
+    INSERT INTO public.mesa_metrics (mesa, tipo, dept_id, muni_id, cdev, padron, validos, emitidos)
+    SELECT m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev,
+           COALESCE(SUM(m.padron), 0), COALESCE(SUM(m.validos), 0), COALESCE(SUM(m.emitidos), 0)
+    FROM public.metadata m
+    JOIN public.ubis u ON u.mesa = m.mesa
+    WHERE m.mesa = ANY(mesas) AND m.tipo IS NOT NULL
+    GROUP BY m.mesa, m.tipo, u.dept_id, u.muni_id, u.cdev
+    ON CONFLICT (mesa, tipo) DO UPDATE
+        SET dept_id = EXCLUDED.dept_id,
+            muni_id = EXCLUDED.muni_id,
+            cdev = EXCLUDED.cdev,
+            padron = EXCLUDED.padron,
+            validos = EXCLUDED.validos,
+            emitidos = EXCLUDED.emitidos;
+    DELETE FROM public.mesa_metrics mm
+    WHERE mm.mesa = ANY(mesas)
+      AND NOT EXISTS (SELECT 1 FROM public.metadata m JOIN public.ubis u ON u.mesa = m.mesa
+                      WHERE m.mesa = mm.mesa AND m.tipo = mm.tipo);
+$$;
+
+
+ALTER FUNCTION public.mesa_metrics_refresh(mesas integer[]) OWNER TO postgres;
+
+--
+-- Name: mesa_metrics_sync(); Type: FUNCTION; Schema: public; Owner: postgres
+--
+
+CREATE FUNCTION public.mesa_metrics_sync() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT DISTINCT mesa FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM new_rows UNION SELECT mesa FROM old_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT DISTINCT mesa FROM old_rows));
+    ELSE
+        DELETE FROM public.mesa_metrics;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+
+ALTER FUNCTION public.mesa_metrics_sync() OWNER TO postgres;
+
+--
+-- Name: mesa_metrics_ubis_sync(); Type: FUNCTION; Schema: public; Owner: postgres
+--
+
+CREATE FUNCTION public.mesa_metrics_ubis_sync() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM new_rows));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM public.mesa_metrics_refresh(ARRAY(
+            SELECT mesa FROM (SELECT mesa, dept_id, muni_id, cdev FROM new_rows
+                              EXCEPT SELECT mesa, dept_id, muni_id, cdev FROM old_rows) moved
+            UNION
+            SELECT mesa FROM (SELECT mesa, dept_id, muni_id, cdev FROM old_rows
+                              EXCEPT SELECT mesa, dept_id, muni_id, cdev FROM new_rows) left_behind));
+    ELSE
+        PERFORM public.mesa_metrics_refresh(ARRAY(SELECT mesa FROM old_rows));
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+
+ALTER FUNCTION public.mesa_metrics_ubis_sync() OWNER TO postgres;
+
 SET default_tablespace = '';
 
 SET default_table_access_method = heap;
 
+--
+-- Name: acta_anomalies; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.acta_anomalies (
+    mesa integer NOT NULL,
+    tipo text NOT NULL,
+    rule text NOT NULL,
+    reported bigint,
+    expected bigint
+);
+
+
+ALTER TABLE public.acta_anomalies OWNER TO postgres;
+
+--
+-- Name: acta_check_state; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.acta_check_state (
+    id boolean DEFAULT true NOT NULL,
+    metadata_id integer DEFAULT 0 NOT NULL,
+    voto_id integer DEFAULT 0 NOT NULL,
+    checked_at timestamp with time zone,
+    CONSTRAINT acta_check_state_id_check CHECK (id)
+);
+
+
+ALTER TABLE public.acta_check_state OWNER TO postgres;
+
+--
+-- Name: mesa_metrics; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.mesa_metrics (
+    mesa integer NOT NULL,
+    tipo text NOT NULL,
+    dept_id text,
+    muni_id text,
+    cdev text,
+    padron bigint NOT NULL,
+    validos bigint NOT NULL,
+    emitidos bigint NOT NULL,
+    participacion double precision GENERATED ALWAYS AS (
+CASE
+    WHEN (padron > 0) THEN (((emitidos)::double precision / (padron)::double precision) * (100.0)::double precision)
+    ELSE (0.0)::double precision
+END) STORED,
+    eficiencia double precision GENERATED ALWAYS AS (
+CASE
+    WHEN (emitidos > 0) THEN (((validos)::double precision / (emitidos)::double precision) * (100.0)::double precision)
+    ELSE (0.0)::double precision
+END) STORED
+);
+
+
+ALTER TABLE public.mesa_metrics OWNER TO postgres;
+
 --
 -- Name: metadata; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -104,6 +243,75 @@ ALTER SEQUENCE public.partido_partido_id_seq OWNER TO postgres;
 ALTER SEQUENCE public.partido_partido_id_seq OWNED BY public.partido.partido_id;
 
 
+--
+-- Name: results_meta_delta; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.results_meta_delta (
+    version_id integer NOT NULL,
+    dept_id text NOT NULL,
+    muni_id text NOT NULL,
+    tipo text NOT NULL,
+    padron bigint NOT NULL,
+    validos bigint NOT NULL,
+    emitidos bigint NOT NULL
+);
+
+
+ALTER TABLE public.results_meta_delta OWNER TO postgres;
+
+--
+-- Name: results_versions; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.results_versions (
+    version_id integer NOT NULL,
+    metadata_id integer NOT NULL,
+    voto_id integer NOT NULL,
+    recorded_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+
+ALTER TABLE public.results_versions OWNER TO postgres;
+
+--
+-- Name: results_versions_version_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+--
+
+CREATE SEQUENCE public.results_versions_version_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+ALTER SEQUENCE public.results_versions_version_id_seq OWNER TO postgres;
+
+--
+-- Name: results_versions_version_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.results_versions_version_id_seq OWNED BY public.results_versions.version_id;
+
+
+--
+-- Name: results_vote_delta; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.results_vote_delta (
+    version_id integer NOT NULL,
+    dept_id text NOT NULL,
+    muni_id text NOT NULL,
+    tipo text NOT NULL,
+    partido_id integer NOT NULL,
+    votos bigint NOT NULL
+);
+
+
+ALTER TABLE public.results_vote_delta OWNER TO postgres;
+
 --
 -- Name: ubis; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -183,6 +391,13 @@ ALTER TABLE ONLY public.metadata ALTER COLUMN metadata_id SET DEFAULT nextval('p
 ALTER TABLE ONLY public.partido ALTER COLUMN partido_id SET DEFAULT nextval('public.partido_partido_id_seq'::regclass);
 
 
+--
+-- Name: results_versions version_id; Type: DEFAULT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_versions ALTER COLUMN version_id SET DEFAULT nextval('public.results_versions_version_id_seq'::regclass);
+
+
 --
 -- Name: voto voto_id; Type: DEFAULT; Schema: public; Owner: postgres
 --
@@ -190,6 +405,30 @@ ALTER TABLE ONLY public.partido ALTER COLUMN partido_id SET DEFAULT nextval('pub
 ALTER TABLE ONLY public.voto ALTER COLUMN voto_id SET DEFAULT nextval('public.voto_voto_id_seq'::regclass);
 
 
+--
+-- Name: acta_anomalies acta_anomalies_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.acta_anomalies
+    ADD CONSTRAINT acta_anomalies_pkey PRIMARY KEY (mesa, tipo, rule);
+
+
+--
+-- Name: acta_check_state acta_check_state_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.acta_check_state
+    ADD CONSTRAINT acta_check_state_pkey PRIMARY KEY (id);
+
+
+--
+-- Name: mesa_metrics mesa_metrics_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.mesa_metrics
+    ADD CONSTRAINT mesa_metrics_pkey PRIMARY KEY (mesa, tipo);
+
+
 --
 -- Name: metadata metadata_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -214,6 +453,30 @@ ALTER TABLE ONLY public.partido
     ADD CONSTRAINT partido_pkey PRIMARY KEY (partido_id);
 
 
+--
+-- Name: results_meta_delta results_meta_delta_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_meta_delta
+    ADD CONSTRAINT results_meta_delta_pkey PRIMARY KEY (dept_id, muni_id, tipo, version_id);
+
+
+--
+-- Name: results_versions results_versions_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_versions
+    ADD CONSTRAINT results_versions_pkey PRIMARY KEY (version_id);
+
+
+--
+-- Name: results_vote_delta results_vote_delta_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_vote_delta
+    ADD CONSTRAINT results_vote_delta_pkey PRIMARY KEY (dept_id, muni_id, partido_id, tipo, version_id);
+
+
 --
 -- Name: ubis ubis_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -238,6 +501,126 @@ ALTER TABLE ONLY public.voto
     ADD CONSTRAINT voto_pkey PRIMARY KEY (voto_id);
 
 
+--
+-- Name: mesa_metrics_muni_eficiencia_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX mesa_metrics_muni_eficiencia_idx ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, eficiencia, mesa);
+
+
+--
+-- Name: mesa_metrics_muni_mesa_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX mesa_metrics_muni_mesa_idx ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, mesa);
+
+
+--
+-- Name: mesa_metrics_muni_participacion_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX mesa_metrics_muni_participacion_idx ON public.mesa_metrics USING btree (dept_id, muni_id, tipo, participacion, mesa);
+
+
+--
+-- Name: metadata_mesa_tipo_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX metadata_mesa_tipo_idx ON public.metadata USING btree (mesa, tipo);
+
+
+--
+-- Name: results_versions_recorded_at_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX results_versions_recorded_at_idx ON public.results_versions USING btree (recorded_at);
+
+
+--
+-- Name: ubis_dept_id_muni_id_cdev_mesa_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX ubis_dept_id_muni_id_cdev_mesa_idx ON public.ubis USING btree (dept_id, muni_id, cdev, mesa);
+
+
+--
+-- Name: ubis_dept_id_muni_id_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX ubis_dept_id_muni_id_idx ON public.ubis USING btree (dept_id, muni_id) INCLUDE (mesa);
+
+
+--
+-- Name: ubis_dept_name_muni_name_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX ubis_dept_name_muni_name_idx ON public.ubis USING btree (dept_name, muni_name) INCLUDE (mesa);
+
+
+--
+-- Name: voto_partido_id_mesa_tipo_idx; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX voto_partido_id_mesa_tipo_idx ON public.voto USING btree (partido_id, mesa, tipo) INCLUDE (voto);
+
+
+--
+-- Name: metadata metadata_mesa_metrics_delete; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER metadata_mesa_metrics_delete AFTER DELETE ON public.metadata REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+
+--
+-- Name: metadata metadata_mesa_metrics_insert; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER metadata_mesa_metrics_insert AFTER INSERT ON public.metadata REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+
+--
+-- Name: metadata metadata_mesa_metrics_truncate; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER metadata_mesa_metrics_truncate AFTER TRUNCATE ON public.metadata FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+
+--
+-- Name: metadata metadata_mesa_metrics_update; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER metadata_mesa_metrics_update AFTER UPDATE ON public.metadata REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_sync();
+
+
+--
+-- Name: ubis ubis_mesa_metrics_delete; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER ubis_mesa_metrics_delete AFTER DELETE ON public.ubis REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+
+--
+-- Name: ubis ubis_mesa_metrics_insert; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER ubis_mesa_metrics_insert AFTER INSERT ON public.ubis REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+
+--
+-- Name: ubis ubis_mesa_metrics_update; Type: TRIGGER; Schema: public; Owner: postgres
+--
+
+CREATE TRIGGER ubis_mesa_metrics_update AFTER UPDATE ON public.ubis REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.mesa_metrics_ubis_sync();
+
+
+--
+-- Name: acta_anomalies acta_anomalies_mesa_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.acta_anomalies
+    ADD CONSTRAINT acta_anomalies_mesa_fkey FOREIGN KEY (mesa) REFERENCES public.ubis(mesa) DEFERRABLE;
+
+
 --
 -- Name: metadata metadata_mesa_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -246,6 +629,22 @@ ALTER TABLE ONLY public.metadata
     ADD CONSTRAINT metadata_mesa_fkey FOREIGN KEY (mesa) REFERENCES public.ubis(mesa) DEFERRABLE;
 
 
+--
+-- Name: results_meta_delta results_meta_delta_version_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_meta_delta
+    ADD CONSTRAINT results_meta_delta_version_id_fkey FOREIGN KEY (version_id) REFERENCES public.results_versions(version_id) ON DELETE CASCADE;
+
+
+--
+-- Name: results_vote_delta results_vote_delta_version_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.results_vote_delta
+    ADD CONSTRAINT results_vote_delta_version_id_fkey FOREIGN KEY (version_id) REFERENCES public.results_versions(version_id) ON DELETE CASCADE;
+
+
 --
 -- Name: voto voto_mesa_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --